@@ -1,16 +1,24 @@
 import pandas as pd
+import os
+import matplotlib
+if os.environ.get('NO_DISPLAY'):
+    matplotlib.use('Agg')  # 画面表示なし: PNG保存のみ
 import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
+
+from csv_cache import load_columns
 
 # 日本語フォント設定（Windowsの場合）
 plt.rcParams['font.family'] = 'MS Gothic'
 plt.rcParams['axes.unicode_minus'] = False  # マイナス記号の文字化け対策
+plt.rcParams['figure.dpi'] = 100   # 画面表示用
+plt.rcParams['savefig.dpi'] = 300  # PNG保存用
 
 # データ読み込み
 csv_file = r'c:\Users\chiro\titech\sotsuron\steam_random_50000_20260116_211133.csv'
 print(f"📂 データ読み込み中: {csv_file}")
-df = pd.read_csv(csv_file)
+# 2回目以降は .npy キャッシュから読み込む
+df = pd.DataFrame(load_columns(csv_file, {'app_id': 'int64', 'player_count': 'float32'}))
 
 print(f"✅ {len(df)}件のデータを読み込みました\n")
 
@@ -23,6 +31,10 @@ print("="*70)
 player_counts = df['player_count'].dropna()
 player_counts_non_zero = player_counts[player_counts > 0]
 
+# float32 で整数を正確に表せるのは 2^24 まで
+assert len(player_counts_non_zero) == 0 or player_counts_non_zero.max() < 2 ** 24, \
+    "プレイヤー数が float32 の整数精度を超えています"
+
 print(f"総ゲーム数:              {len(df):,}")
 print(f"プレイヤー数データあり:  {len(player_counts):,}")
 print(f"プレイヤー数 > 0:        {len(player_counts_non_zero):,}")
@@ -42,9 +54,17 @@ print("="*70)
 # TOP 10表示
 print("\n🏆 プレイヤー数 TOP 10")
 print("="*70)
-top_10 = df.nlargest(10, 'player_count')[['app_id', 'player_count']]
-for i, (idx, row) in enumerate(top_10.iterrows(), 1):
-    print(f"{i:2d}. AppID {int(row['app_id']):8d}: {int(row['player_count']):10,} 人")
+# 全体をソートせず、上位10件だけを部分選択してから並べ替える
+counts_arr = df['player_count'].to_numpy()
+app_ids_arr = df['app_id'].to_numpy()
+has_count = ~np.isnan(counts_arr)
+counts_arr, app_ids_arr = counts_arr[has_count], app_ids_arr[has_count]
+top_k = min(10, len(counts_arr))
+if top_k > 0:
+    top_idx = np.argpartition(counts_arr, -top_k)[-top_k:]
+    top_idx = top_idx[np.argsort(-counts_arr[top_idx], kind='stable')]
+    for i, (app_id, count) in enumerate(zip(app_ids_arr[top_idx], counts_arr[top_idx]), 1):
+        print(f"{i:2d}. AppID {int(app_id):8d}: {int(count):10,} 人")
 print("="*70)
 
 # ヒストグラム作成
@@ -53,8 +73,14 @@ fig.suptitle('Steam ゲーム プレイヤー数分布分析', fontsize=16, font
 
 # 1. 全データ（0含む）のヒストグラム
 ax1 = axes[0, 0]
-ax1.hist(player_counts.fillna(0), bins=50, color='skyblue', edgecolor='black', alpha=0.7)
-ax1.set_xlabel('プレイヤー数', fontsize=12)
+# べき分布的な偏りがあるため対数ビンで集計（0を含むので +1 してから）
+all_counts = player_counts.to_numpy()
+log_bins = np.logspace(0, np.log10(all_counts.max() + 1), 51)
+counts, _ = np.histogram(all_counts + 1, bins=log_bins)
+ax1.bar(log_bins[:-1], counts, width=np.diff(log_bins), align='edge',
+        color='skyblue', edgecolor='black', alpha=0.7)
+ax1.set_xscale('log')
+ax1.set_xlabel('プレイヤー数 + 1（対数スケール）', fontsize=12)
 ax1.set_ylabel('ゲーム数', fontsize=12)
 ax1.set_title('プレイヤー数の分布（全データ）', fontsize=14, fontweight='bold')
 ax1.grid(True, alpha=0.3)
@@ -65,7 +91,9 @@ ax1.text(0.95, 0.95, f'N = {len(player_counts):,}',
 # 2. プレイヤー数 > 0 のヒストグラム（対数スケール）
 ax2 = axes[0, 1]
 if len(player_counts_non_zero) > 0:
-    ax2.hist(player_counts_non_zero, bins=50, color='coral', edgecolor='black', alpha=0.7)
+    counts, edges = np.histogram(player_counts_non_zero.to_numpy(), bins=50)
+    ax2.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+            color='coral', edgecolor='black', alpha=0.7)
     ax2.set_xlabel('プレイヤー数', fontsize=12)
     ax2.set_ylabel('ゲーム数', fontsize=12)
     ax2.set_title('プレイヤー数の分布（> 0、対数スケール）', fontsize=14, fontweight='bold')
@@ -79,7 +107,9 @@ if len(player_counts_non_zero) > 0:
 ax3 = axes[1, 0]
 if len(player_counts_non_zero) > 0:
     log_counts = np.log10(player_counts_non_zero + 1)  # +1してlog(0)を回避
-    ax3.hist(log_counts, bins=50, color='lightgreen', edgecolor='black', alpha=0.7)
+    counts, edges = np.histogram(log_counts.to_numpy(), bins=50)
+    ax3.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+            color='lightgreen', edgecolor='black', alpha=0.7)
     ax3.set_xlabel('log10(プレイヤー数 + 1)', fontsize=12)
     ax3.set_ylabel('ゲーム数', fontsize=12)
     ax3.set_title('プレイヤー数の対数分布', fontsize=14, fontweight='bold')
@@ -117,7 +147,8 @@ output_file = 'player_count_histogram.png'
 plt.savefig(output_file, dpi=300, bbox_inches='tight')
 print(f"\n💾 ヒストグラムを保存しました: {output_file}")
 
-# 表示
-plt.show()
+# 表示（NO_DISPLAY 指定時は保存のみ）
+if not os.environ.get('NO_DISPLAY'):
+    plt.show()
 
 print("\n✨ 分析完了！")
@@ -4,14 +4,14 @@
 """
 
 import numpy as np
-from scipy import stats
 import sys
 
 
 def calculate_power_law(data):
     """べき指数とR²を計算"""
-    # 0を除外してソート
-    data = np.array([x for x in data if x > 0])
+    # 0・非有限値を除外してソート
+    data = np.asarray(data, dtype=np.float64)
+    data = data[np.isfinite(data) & (data > 0)]
     
     if len(data) == 0:
         return None, None, None
@@ -26,16 +26,46 @@ def calculate_power_law(data):
     log_ranks = np.log10(ranks)
     log_values = np.log10(sorted_data)
     
-    # 線形回帰 (log-log空間)
-    slope, intercept, r_value, p_value, std_err = stats.linregress(log_ranks, log_values)
+    # 線形回帰 (log-log空間) — 傾きとR²だけなのでモーメントから閉形式で計算
+    n = len(sorted_data)
+    sx, sy = log_ranks.sum(), log_values.sum()
+    sxx_c = n * np.dot(log_ranks, log_ranks) - sx * sx
+    syy_c = n * np.dot(log_values, log_values) - sy * sy
+    sxy_c = n * np.dot(log_ranks, log_values) - sx * sy
+    slope = sxy_c / sxx_c
     
     # べき指数α = -slope
     alpha = -slope
-    r_squared = r_value ** 2
+    r_squared = sxy_c ** 2 / (sxx_c * syy_c)
     
     return alpha, r_squared, len(data)
 
 
+def read_values(stream) -> np.ndarray:
+    """空行(またはEOF)までの入力をまとめて読み込み、数値配列に変換"""
+    lines = []
+    for line in stream:
+        # 空行で終了
+        if not line.strip():
+            break
+        lines.append(line)
+    
+    # まとめてC実装で数値変換（1行ずつ float() しない）
+    try:
+        return np.array(''.join(lines).split(), dtype=np.float64)
+    except ValueError:
+        pass
+    
+    # 数値でない行が混じっている場合のみ1行ずつ解釈
+    values = []
+    for line in lines:
+        try:
+            values.append(float(line))
+        except ValueError:
+            print(f"⚠️  警告: '{line.strip()}' は数値ではありません (スキップ)", file=sys.stderr)
+    return np.array(values, dtype=np.float64)
+
+
 def main():
     print("=" * 70)
     print("📊 べき指数計算ツール")
@@ -53,34 +83,8 @@ def main():
     print("=" * 70)
     print("\nデータを入力してください (終了は空行):\n")
     
-    data = []
-    line_count = 0
-    
-    while True:
-        try:
-            line = input().strip()
-            
-            # 空行で終了
-            if not line:
-                break
-            
-            # 数値に変換
-            try:
-                value = float(line)
-                data.append(value)
-                line_count += 1
-                
-                # 10個ごとに進捗表示
-                if line_count % 10 == 0:
-                    print(f"  → {line_count}個入力済み...", file=sys.stderr)
-                
-            except ValueError:
-                print(f"⚠️  警告: '{line}' は数値ではありません (スキップ)", file=sys.stderr)
-                continue
-                
-        except EOFError:
-            # Ctrl+D または Ctrl+Z で終了
-            break
+    # 空行 または Ctrl+D / Ctrl+Z (EOF) で終了
+    data = read_values(sys.stdin)
     
     print(f"\n📥 入力完了: {len(data)}個のデータ")
     
@@ -127,14 +131,14 @@ def main():
         print(f"  ⚠️  α={alpha:.3f} → やや均等寄り (α > 3)")
     
     # 基本統計も表示
-    positive_data = [x for x in data if x > 0]
-    if positive_data:
+    positive_data = data[data > 0]
+    if len(positive_data) > 0:
         print("\n📊 基本統計:")
-        print(f"  最大値:     {max(positive_data):>15,.0f}")
-        print(f"  最小値:     {min(positive_data):>15,.0f}")
-        print(f"  平均値:     {np.mean(positive_data):>15,.1f}")
+        print(f"  最大値:     {positive_data.max():>15,.0f}")
+        print(f"  最小値:     {positive_data.min():>15,.0f}")
+        print(f"  平均値:     {positive_data.mean():>15,.1f}")
         print(f"  中央値:     {np.median(positive_data):>15,.0f}")
-        print(f"  合計:       {sum(positive_data):>15,.0f}")
+        print(f"  合計:       {positive_data.sum():>15,.0f}")
     
     print("\n" + "=" * 70)
 
@@ -1,21 +1,31 @@
-import pandas as pd
+import os
+import matplotlib
+if os.environ.get('NO_DISPLAY'):
+    matplotlib.use('Agg')  # 画面表示なし: PNG保存のみ
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import stats
-import seaborn as sns
+
+from csv_cache import load_columns
+from power_law import sort_descending, compute_metrics, ccdf_points, concentration_curve
 
 # 日本語フォント設定
 plt.rcParams['font.family'] = 'MS Gothic'
 plt.rcParams['axes.unicode_minus'] = False
+plt.rcParams['figure.dpi'] = 100   # 画面表示用
+plt.rcParams['savefig.dpi'] = 300  # PNG保存用
 
 # データ読み込み
 csv_file = r'C:\Users\chiro\titech\sotsuron\data\steam_random_10000_20260115_150016.csv'
 print(f"📂 データ読み込み中: {csv_file}")
-df = pd.read_csv(csv_file)
+# 2回目以降は .npy キャッシュから読み込む
+player_counts = load_columns(csv_file, {'player_count': 'float32'})['player_count']
+
+# プレイヤー数 > 0 のデータを抽出（NaN は比較で False になり除外される）
+player_counts_non_zero = player_counts[player_counts > 0]
 
-# プレイヤー数 > 0 のデータを抽出
-player_counts = df['player_count'].dropna()
-player_counts_non_zero = player_counts[player_counts > 0].values
+# float32 で整数を正確に表せるのは 2^24 まで
+assert len(player_counts_non_zero) == 0 or player_counts_non_zero.max() < 2 ** 24, \
+    "プレイヤー数が float32 の整数精度を超えています"
 
 print(f"\n{'='*70}")
 print(f"📊 べき分布（パレート分布）の検証")
@@ -24,14 +34,14 @@ print(f"分析対象: {len(player_counts_non_zero):,}ゲーム（プレイヤー
 
 # 1. 基本統計
 print("【基本統計】")
-print(f"平均:     {np.mean(player_counts_non_zero):,.2f}")
+print(f"平均:     {np.mean(player_counts_non_zero, dtype=np.float64):,.2f}")
 print(f"中央値:   {np.median(player_counts_non_zero):,.2f}")
 print(f"最大値:   {np.max(player_counts_non_zero):,}")
 print(f"最小値:   {np.min(player_counts_non_zero):,}")
 print(f"標準偏差: {np.std(player_counts_non_zero):,.2f}")
 
 # 平均/中央値比（べき分布では大きくなる）
-mean_median_ratio = np.mean(player_counts_non_zero) / np.median(player_counts_non_zero)
+mean_median_ratio = np.mean(player_counts_non_zero, dtype=np.float64) / np.median(player_counts_non_zero)
 print(f"\n平均/中央値比: {mean_median_ratio:.2f}")
 if mean_median_ratio > 2:
     print("→ ロングテール分布の特徴あり（べき分布の可能性高）")
@@ -43,16 +53,17 @@ print(f"\n{'='*70}")
 print("【べき分布の特徴】")
 print(f"{'='*70}")
 
-# データをソートして累積分布を作成
-sorted_counts = np.sort(player_counts_non_zero)[::-1]  # 降順
+# データを1回だけソートし、指標をまとめて計算
+sorted_counts = sort_descending(player_counts_non_zero)  # 降順
+sorted_asc = sorted_counts[::-1]
 ranks = np.arange(1, len(sorted_counts) + 1)
-
-# ランク vs 値の対数-対数プロット用の傾き計算
 log_ranks = np.log10(ranks)
-log_counts = np.log10(sorted_counts)
 
-# 線形回帰で傾きを推定
-slope, intercept, r_value, p_value, std_err = stats.linregress(log_ranks, log_counts)
+metrics = compute_metrics(sorted_counts)
+slope = metrics['slope']
+intercept = metrics['intercept']
+r_value = metrics['r_value']
+p_value = metrics['p_value']
 
 print(f"対数-対数プロットの傾き（べき指数α）: {-slope:.3f}")
 print(f"決定係数 R²: {r_value**2:.4f}")
@@ -76,11 +87,8 @@ elif -slope < 3:
 else:
     print("→ α > 3: 比較的均等な分布")
 
-# 3. ジニ係数計算（不平等度の指標）
-sorted_values = np.sort(player_counts_non_zero)
-n = len(sorted_values)
-cumsum = np.cumsum(sorted_values)
-gini = (2 * np.sum((np.arange(1, n+1)) * sorted_values)) / (n * np.sum(sorted_values)) - (n + 1) / n
+# 3. ジニ係数（不平等度の指標）
+gini = metrics['gini']
 
 print(f"\n【ジニ係数】: {gini:.4f}")
 if gini > 0.6:
@@ -91,11 +99,7 @@ else:
     print("→ 比較的平等な分布")
 
 # 4. 上位20%が占める割合（パレートの法則: 80/20ルール）
-sorted_desc = np.sort(player_counts_non_zero)[::-1]
-top_20_percent_count = int(len(sorted_desc) * 0.2)
-top_20_percent_sum = np.sum(sorted_desc[:top_20_percent_count])
-total_sum = np.sum(sorted_desc)
-top_20_ratio = top_20_percent_sum / total_sum
+top_20_ratio = metrics['pareto_20']
 
 print(f"\n【パレートの法則チェック】")
 print(f"上位20%のゲームが占める割合: {top_20_ratio*100:.1f}%")
@@ -108,9 +112,7 @@ else:
 
 # 上位1%, 5%, 10%も確認
 for pct in [1, 5, 10]:
-    top_n = int(len(sorted_desc) * pct / 100)
-    top_sum = np.sum(sorted_desc[:top_n])
-    ratio = top_sum / total_sum
+    ratio = metrics[f'top_{pct}_pct']
     print(f"上位{pct:2d}%のゲームが占める割合: {ratio*100:.1f}%")
 
 # 5. 可視化
@@ -133,9 +135,7 @@ ax1.legend()
 
 # サブプロット2: 累積分布関数（CCDF）
 ax2 = plt.subplot(2, 3, 2)
-unique_values = np.unique(player_counts_non_zero)
-ccdf = np.array([np.sum(player_counts_non_zero >= val) / len(player_counts_non_zero) 
-                 for val in unique_values])
+unique_values, ccdf = ccdf_points(sorted_asc)
 ax2.scatter(unique_values, ccdf, alpha=0.5, s=20)
 ax2.set_xscale('log')
 ax2.set_yscale('log')
@@ -147,7 +147,8 @@ ax2.grid(True, alpha=0.3)
 # サブプロット3: ヒストグラム（対数ビン）
 ax3 = plt.subplot(2, 3, 3)
 bins = np.logspace(np.log10(1), np.log10(max(player_counts_non_zero)), 50)
-ax3.hist(player_counts_non_zero, bins=bins, alpha=0.7, edgecolor='black')
+counts, _ = np.histogram(player_counts_non_zero, bins=bins)
+ax3.bar(bins[:-1], counts, width=np.diff(bins), align='edge', alpha=0.7, edgecolor='black')
 ax3.set_xscale('log')
 ax3.set_xlabel('プレイヤー数（対数スケール）', fontsize=12)
 ax3.set_ylabel('ゲーム数', fontsize=12)
@@ -156,7 +157,7 @@ ax3.grid(True, alpha=0.3)
 
 # サブプロット4: ローレンツ曲線
 ax4 = plt.subplot(2, 3, 4)
-sorted_values = np.sort(player_counts_non_zero)
+sorted_values = sorted_asc
 cumsum_values = np.cumsum(sorted_values)
 lorenz = cumsum_values / cumsum_values[-1]
 population = np.arange(1, len(sorted_values) + 1) / len(sorted_values)
@@ -172,13 +173,7 @@ ax4.grid(True, alpha=0.3)
 # サブプロット5: 上位集中度
 ax5 = plt.subplot(2, 3, 5)
 percentiles = np.arange(1, 101)
-concentration = []
-for p in percentiles:
-    top_n = int(len(sorted_desc) * p / 100)
-    if top_n == 0:
-        top_n = 1
-    ratio = np.sum(sorted_desc[:top_n]) / total_sum
-    concentration.append(ratio * 100)
+concentration = concentration_curve(sorted_counts, percentiles)
 
 ax5.plot(percentiles, concentration, linewidth=2, color='green')
 ax5.axhline(y=80, color='red', linestyle='--', alpha=0.5, label='80%ライン')
@@ -193,11 +188,15 @@ ax5.grid(True, alpha=0.3)
 
 # サブプロット6: Q-Qプロット（べき分布との比較）
 ax6 = plt.subplot(2, 3, 6)
-# パレート分布のシミュレーション
+# パレート分布の分位点関数 x_min * (1 - p)^(-1/α) を一括で評価
 alpha_est = -slope
-x_min = np.min(player_counts_non_zero)
-theoretical = stats.pareto.rvs(alpha_est, scale=x_min, size=len(player_counts_non_zero))
-stats.probplot(player_counts_non_zero, dist=stats.pareto(alpha_est, scale=x_min), plot=ax6)
+x_min = sorted_asc[0]
+plotting_pos = (ranks - 0.5) / len(ranks)
+theoretical = x_min * (1.0 - plotting_pos) ** (-1.0 / alpha_est)
+ax6.scatter(theoretical, sorted_asc, alpha=0.5, s=20)
+ax6.plot([theoretical[0], theoretical[-1]], [theoretical[0], theoretical[-1]],
+         'r--', linewidth=2, label='理論直線')
+ax6.legend()
 ax6.set_title('Q-Qプロット（パレート分布）', fontsize=14, fontweight='bold')
 ax6.set_xlabel('理論分位点', fontsize=12)
 ax6.set_ylabel('サンプル分位点', fontsize=12)
@@ -212,7 +211,9 @@ print(f"\n{'='*70}")
 print(f"💾 べき分布分析グラフを保存: {output_file}")
 print(f"{'='*70}")
 
-plt.show()
+# 表示（NO_DISPLAY 指定時は保存のみ）
+if not os.environ.get('NO_DISPLAY'):
+    plt.show()
 
 # 結論
 print(f"\n{'='*70}")
@@ -0,0 +1,70 @@
+"""
+分析用CSVの列キャッシュ
+必要な列だけを .npy に保存し、2回目以降はCSVを解析せずに読み込む
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'  # マルチスレッドでCSVを解析
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# これより大きいCSVはチャンク単位で解析し、ピークメモリを抑える
+CHUNKED_READ_BYTES = 512 * 1024 * 1024
+CHUNK_ROWS = 1_000_000
+
+
+def load_columns(csv_path, dtypes):
+    """
+    CSVから指定列を numpy 配列として読み込む
+
+    CSVより新しい .npy キャッシュがあればそれを memmap で開き、
+    なければCSVを解析してキャッシュを作成する。
+
+    Args:
+        csv_path: CSVファイルパス
+        dtypes: {列名: dtype} の辞書（読み込む列と型）
+
+    Returns:
+        {列名: numpy配列} の辞書
+    """
+    csv_path = Path(csv_path)
+    csv_mtime = csv_path.stat().st_mtime
+    cache_paths = {col: csv_path.with_suffix(f'.{col}.npy') for col in dtypes}
+
+    if all(p.exists() and p.stat().st_mtime >= csv_mtime for p in cache_paths.values()):
+        print(f"⚡ キャッシュから読み込み: {csv_path.name}")
+        return {col: np.load(p, mmap_mode='r') for col, p in cache_paths.items()}
+
+    columns = _read_columns(csv_path, dtypes)
+    for col, cache_path in cache_paths.items():
+        try:
+            np.save(cache_path, columns[col])
+        except OSError as e:
+            print(f"⚠️  キャッシュ保存エラー: {e}")
+
+    return columns
+
+
+def _read_columns(csv_path, dtypes):
+    """CSVから使う列だけを型指定で読み込む"""
+    if csv_path.stat().st_size <= CHUNKED_READ_BYTES:
+        df = pd.read_csv(csv_path, usecols=list(dtypes), dtype=dtypes, engine=CSV_ENGINE)
+        return {col: df[col].to_numpy() for col in dtypes}
+
+    # 大きなファイルは列ごとの配列だけを残しながら逐次解析
+    # (pyarrow エンジンは chunksize 非対応のため C エンジンを使う)
+    print(f"📦 チャンク読み込み: {CHUNK_ROWS:,} 行ずつ")
+    parts = {col: [] for col in dtypes}
+    for chunk in pd.read_csv(csv_path, usecols=list(dtypes), dtype=dtypes, chunksize=CHUNK_ROWS):
+        for col in dtypes:
+            parts[col].append(chunk[col].to_numpy())
+
+    return {
+        col: np.concatenate(arrays) if arrays else np.empty(0, dtype=dtypes[col])
+        for col, arrays in parts.items()
+    }
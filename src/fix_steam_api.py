@@ -1,136 +1,143 @@
 ﻿import sys
 import os
 
+import libcst as cst
+
+# steam_api_data.py に APIキー対応を加えた steam_api_data_fixed.py を生成する。
+# アプリIDの取得処理は steam_api_base.SteamAppIdMixin が self.api_key を見て切り替えるため、
+# ここではコンストラクタに api_key を通すだけでよい。
+# libcst で構文木を1回だけ走査して書き換えるので、コメントや書式は保持され、
+# 変換済みのファイルに再適用しても結果は変わらない。
+
 input_path = "steam_api_data.py"
 output_path = "steam_api_data_fixed.py"
 
+CLASS_NAME = "SteamRandomCollector"
+
+# 引数の既定値は空白なしの "=" で出力する
+NO_SPACE_EQUAL = cst.AssignEqual(
+    whitespace_before=cst.SimpleWhitespace(""),
+    whitespace_after=cst.SimpleWhitespace(""),
+)
+
+API_KEY_STATEMENT = cst.parse_statement("STEAM_API_KEY = os.environ.get('STEAM_API_KEY', '')\n").with_changes(
+    leading_lines=[
+        cst.EmptyLine(),
+        cst.EmptyLine(comment=cst.Comment("# API Key（https://steamcommunity.com/dev/apikey で取得し、環境変数 STEAM_API_KEY に設定）")),
+    ]
+)
+
+
+def _is_import(stmt):
+    return isinstance(stmt, cst.SimpleStatementLine) and any(
+        isinstance(s, (cst.Import, cst.ImportFrom)) for s in stmt.body
+    )
+
+
+def _imports_os(stmt):
+    return isinstance(stmt, cst.SimpleStatementLine) and any(
+        isinstance(s, cst.Import)
+        and any(isinstance(a.name, cst.Name) and a.name.value == "os" and a.asname is None for a in s.names)
+        for s in stmt.body
+    )
+
+
+def _assigns(stmt, name):
+    return isinstance(stmt, cst.SimpleStatementLine) and any(
+        isinstance(s, cst.Assign)
+        and any(isinstance(t.target, cst.Name) and t.target.value == name for t in s.targets)
+        for s in stmt.body
+    )
+
+
+def _is_docstring(stmt):
+    return (
+        isinstance(stmt, cst.SimpleStatementLine)
+        and isinstance(stmt.body[0], cst.Expr)
+        and isinstance(stmt.body[0].value, (cst.SimpleString, cst.ConcatenatedString))
+    )
+
+
+class ApiKeyTransformer(cst.CSTTransformer):
+    """SteamRandomCollector を APIキー対応版に書き換える"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_collector = False
+
+    def visit_ClassDef(self, node):
+        if node.name.value == CLASS_NAME:
+            self.in_collector = True
+
+    def leave_ClassDef(self, original_node, updated_node):
+        if original_node.name.value == CLASS_NAME:
+            self.in_collector = False
+        return updated_node
+
+    def leave_FunctionDef(self, original_node, updated_node):
+        # __init__ に api_key=None を追加し、self.api_key に保持する
+        if not self.in_collector or original_node.name.value != "__init__":
+            return updated_node
+
+        params = list(updated_node.params.params)
+        if any(p.name.value == "api_key" for p in params):
+            return updated_node
+
+        api_key_param = cst.Param(name=cst.Name("api_key"), default=cst.Name("None"), equal=NO_SPACE_EQUAL)
+        params.insert(1, api_key_param)  # self の直後
+
+        body = list(updated_node.body.body)
+        position = 1 if body and _is_docstring(body[0]) else 0
+        body.insert(position, cst.parse_statement("self.api_key = api_key\n"))
+
+        return updated_node.with_changes(
+            params=updated_node.params.with_changes(params=params),
+            body=updated_node.body.with_changes(body=body),
+        )
+
+    def leave_Call(self, original_node, updated_node):
+        # main() のコレクター生成に api_key を渡す
+        func = updated_node.func
+        if not (isinstance(func, cst.Name) and func.value == CLASS_NAME):
+            return updated_node
+        if any(a.keyword is not None and a.keyword.value == "api_key" for a in updated_node.args):
+            return updated_node
+
+        api_key_arg = cst.Arg(
+            keyword=cst.Name("api_key"),
+            value=cst.parse_expression("STEAM_API_KEY or None"),
+            equal=NO_SPACE_EQUAL,
+        )
+        if updated_node.args:
+            # 既存の引数と同じ区切り（改行・インデント）を使う
+            api_key_arg = api_key_arg.with_changes(comma=updated_node.args[0].comma)
+
+        return updated_node.with_changes(args=[api_key_arg, *updated_node.args])
+
+    def leave_Module(self, original_node, updated_node):
+        # import 群の直後に STEAM_API_KEY を定義（環境変数から読むので import os も確保する）
+        body = list(updated_node.body)
+        if any(_assigns(stmt, "STEAM_API_KEY") for stmt in body):
+            return updated_node
+
+        last_import = max((i for i, stmt in enumerate(body) if _is_import(stmt)), default=-1)
+        if not any(_imports_os(stmt) for stmt in body):
+            last_import += 1
+            body.insert(last_import, cst.parse_statement("import os\n"))
+        body.insert(last_import + 1, API_KEY_STATEMENT)
+        return updated_node.with_changes(body=body)
+
+
 if not os.path.exists(input_path):
     print(f"Error: {input_path} not found.")
     sys.exit(1)
 
 with open(input_path, 'r', encoding='utf-8') as f:
-    lines = f.readlines()
-
-new_lines = []
-imports_done = False
-in_get_all = False
-
-new_methods = '''    
-    def get_all_app_ids(self) -> List[int]:
-        """Steam上の全アプリケーションIDを取得"""
-        logger.info(" 全アプリケーションリストを取得中...")
-        
-        # 1. APIキーがある場合は新しいIStoreServiceを使用
-        if self.api_key:
-            return self._get_app_ids_via_store_service()
-            
-        # 2. 従来のAPIを試行
-        try:
-            logger.info(" APIキー未指定: 旧API(ISteamApps)を試行します...")
-            url = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            
-            response = self.session.get(url, headers=headers, timeout=self.timeout)
-            response.raise_for_status()
-            
-            data = response.json()
-            apps = data['applist']['apps']
-            app_ids = [app['appid'] for app in apps if app.get('appid')]
-            
-            logger.info(f" {len(app_ids):,}個のアプリケーションIDを取得しました")
-            return app_ids
-            
-        except Exception as e:
-            logger.error(f" 旧API取得エラー: {e}")
-            logger.warning(" ヒント: Steam APIの仕様変更により、APIキーが必要な場合があります。")
-            logger.warning("   https://steamcommunity.com/dev/apikey でキーを取得し、ファイルの先頭にある STEAM_API_KEY に設定してください。")
-            return []
-
-    def _get_app_ids_via_store_service(self) -> List[int]:
-        """IStoreService (v1) を使用してアプリIDを取得（APIキー必須）"""
-        url = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
-        app_ids = []
-        last_appid = 0
-        has_more = True
-        
-        logger.info(" IStoreService(v1)経由でリスト取得中...")
-        
-        while has_more:
-            params = {
-                'key': self.api_key,
-                'include_games': 1,
-                'include_dlc': 0,
-                'include_software': 0,
-                'last_appid': last_appid,
-                'max_results': 50000
-            }
-            try:
-                resp = self.session.get(url, params=params, timeout=self.timeout)
-                resp.raise_for_status()
-                data = resp.json()
-                
-                response_body = data.get('response', {})
-                apps = response_body.get('apps', [])
-                
-                if not apps:
-                    break
-                
-                new_ids = [app['appid'] for app in apps]
-                app_ids.extend(new_ids)
-                
-                last_appid = response_body.get('last_appid')
-                has_more = response_body.get('have_more_results', False)
-                
-                logger.info(f"  - 現在 {len(app_ids)} 件...")
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f" IStoreServiceエラー: {e}")
-                break
-        
-        if app_ids:
-            logger.info(f" {len(app_ids):,}個のアプリケーションIDを取得しました")
-        
-        return app_ids
-'''
-
-for line in lines:
-    if not imports_done and line.startswith('from typing import'):
-        new_lines.append(line)
-        new_lines.append("\\n# API Key（https://steamcommunity.com/dev/apikey で取得）\\n")
-        new_lines.append("STEAM_API_KEY = \"\"\\n\\n")
-        imports_done = True
-        continue
-        
-    if "def __init__(self, delay=0.6" in line:
-        new_lines.append("    def __init__(self, api_key=None, delay=0.6, timeout=10, checkpoint_interval=100):\\n")
-        continue
-    if "self.timeout = timeout" in line:
-        new_lines.append("        self.api_key = api_key\\n")
-        new_lines.append(line)
-        continue
-        
-    if "def get_all_app_ids(self) -> List[int]:" in line:
-        in_get_all = True
-        new_lines.append(new_methods)
-        continue
-    
-    if in_get_all:
-        if "def random_sample_app_ids" in line:
-            in_get_all = False
-            new_lines.append("\\n" + line)
-        continue
-
-    if "collector = SteamRandomCollector(" in line:
-        new_lines.append("    # APIキーを設定\\n")
-        new_lines.append("    api_key_to_use = STEAM_API_KEY if STEAM_API_KEY else None\\n")
-        new_lines.append("    collector = SteamRandomCollector(\\n")
-        new_lines.append("        api_key=api_key_to_use,\\n")
-        continue
+    module = cst.parse_module(f.read())
 
-    new_lines.append(line)
+fixed = module.visit(ApiKeyTransformer())
 
 with open(output_path, 'w', encoding='utf-8') as f:
-    f.writelines(new_lines)
+    f.write(fixed.code)
     
 print(f"Created {output_path}")
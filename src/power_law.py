@@ -0,0 +1,326 @@
+"""
+べき分布分析の共通処理
+指標計算（numba カーネル）とグラフ作成を analyze_review_power_law / check_power_law で共有
+"""
+
+import math
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy import stats
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # numba 未導入時は通常のPython関数として実行
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+    prange = range
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _metrics_kernel(sorted_desc):
+    """降順配列を1回だけ走査し、回帰用モーメント・累積和・Gini用の重み付き和をまとめて計算"""
+    n = sorted_desc.shape[0]
+    sx = 0.0
+    sy = 0.0
+    sxx = 0.0
+    syy = 0.0
+    sxy = 0.0
+    weighted_sum = 0.0
+    
+    # スカラーへの += はスレッドごとに集計され、最後に合算される
+    for i in prange(n):
+        v = sorted_desc[i]
+        lx = math.log10(i + 1.0)
+        ly = math.log10(v)
+        sx += lx
+        sy += ly
+        sxx += lx * lx
+        syy += ly * ly
+        sxy += lx * ly
+        # 昇順での順位は n - i
+        weighted_sum += (n - i) * v
+    
+    # 累積和は逐次依存があるため並列ループの外で計算 (top_sums[k] = 上位k件の合計)
+    # numba の np.cumsum は dtype を指定できないので、float64 で明示的に足し込む
+    top_sums = np.empty(n + 1, dtype=np.float64)
+    acc = 0.0
+    top_sums[0] = acc
+    for i in range(n):
+        acc += sorted_desc[i]
+        top_sums[i + 1] = acc
+    
+    return sx, sy, sxx, syy, sxy, weighted_sum, top_sums
+
+
+def _linregress_from_moments(n, sx, sy, sxx, syy, sxy):
+    """モーメントから最小二乗直線を閉形式で求める (stats.linregress 相当)"""
+    sxx_c = n * sxx - sx * sx
+    syy_c = n * syy - sy * sy
+    sxy_c = n * sxy - sx * sy
+    
+    slope = sxy_c / sxx_c
+    intercept = (sy - slope * sx) / n
+    r_value = sxy_c / math.sqrt(sxx_c * syy_c)
+    
+    # 傾き0の検定 (自由度 n-2 のt検定)
+    if abs(r_value) >= 1.0:
+        p_value = 0.0
+    else:
+        t = r_value * math.sqrt((n - 2) / ((1.0 - r_value) * (1.0 + r_value)))
+        p_value = 2 * stats.t.sf(abs(t), n - 2)
+    
+    return slope, intercept, r_value, p_value
+
+
+def sort_descending(data):
+    """降順ソートした連続配列を返す（指標計算とグラフ作成で共有し、再ソートしない）"""
+    return np.ascontiguousarray(np.sort(data)[::-1])
+
+
+def compute_metrics(sorted_data):
+    """べき分布の各種指標を計算（sorted_data は sort_descending 済みの配列）"""
+    
+    # 配列は float32 のまま渡し、和の集計はカーネル内で float64 で行う
+    n = len(sorted_data)
+    
+    # 1パスで必要な和をすべて計算
+    sx, sy, sxx, syy, sxy, weighted_sum, top_sums = _metrics_kernel(sorted_data)
+    
+    # 線形回帰 (log-log)
+    slope, intercept, r_value, p_value = _linregress_from_moments(n, sx, sy, sxx, syy, sxy)
+    
+    alpha = -slope  # べき指数
+    r_squared = r_value ** 2
+    
+    total_sum = top_sums[-1]
+    
+    # Gini係数
+    gini = 2.0 * weighted_sum / (n * total_sum) - (n + 1) / n
+    
+    # パレート分析 (上位20%)
+    pareto_ratio = top_sums[int(n * 0.2)] / total_sum
+    
+    # 上位1%, 5%, 10%, 50%の分析
+    top_1_sum = top_sums[max(1, int(n * 0.01))]
+    top_5_sum = top_sums[max(1, int(n * 0.05))]
+    top_10_sum = top_sums[max(1, int(n * 0.10))]
+    top_50_sum = top_sums[int(n * 0.5)]
+    
+    return {
+        'alpha': alpha,
+        'r_squared': r_squared,
+        'gini': gini,
+        'pareto_20': pareto_ratio,
+        'top_1_pct': top_1_sum / total_sum,
+        'top_5_pct': top_5_sum / total_sum,
+        'top_10_pct': top_10_sum / total_sum,
+        'top_50_pct': top_50_sum / total_sum,
+        'slope': slope,
+        'intercept': intercept,
+        'r_value': r_value,
+        'p_value': p_value
+    }
+
+
+def ccdf_points(sorted_asc):
+    """昇順ソート済み配列から CCDF (P(X ≥ x)) の点列を返す"""
+    # ソート済みなので隣接要素の比較だけで重複を除ける（np.unique は再ソートする）
+    is_first = np.empty(len(sorted_asc), dtype=bool)
+    is_first[0] = True
+    np.not_equal(sorted_asc[1:], sorted_asc[:-1], out=is_first[1:])
+    unique_values = sorted_asc[is_first]
+    # X >= x となる件数 = 全体 - (x 未満の件数) を二分探索でまとめて求める
+    ccdf = 1.0 - np.searchsorted(sorted_asc, unique_values, side='left') / len(sorted_asc)
+    return unique_values, ccdf
+
+
+def concentration_curve(sorted_desc, percentiles):
+    """上位 p% が全体に占める割合 (%) を累積和1本からまとめて求める"""
+    top_sums = np.cumsum(sorted_desc, dtype=np.float64)
+    top_ns = np.maximum(len(sorted_desc) * np.asarray(percentiles) // 100, 1)
+    return top_sums[top_ns - 1] / top_sums[-1] * 100
+
+
+def make_plots(data, metrics, output_path, value_label='レビュー数', title='Steamレビュー数のべき分布分析'):
+    """
+    分析グラフ (3x3) を作成
+    
+    Args:
+        data: sort_descending 済みの配列
+        metrics: compute_metrics の戻り値
+        output_path: PNG保存先
+        value_label: 軸ラベル等に使う値の名前（例: 'レビュー数', 'プレイヤー数'）
+        title: 図全体のタイトル
+    """
+    
+    fig = plt.figure(figsize=(16, 12))
+    
+    sorted_data = data
+    sorted_asc = sorted_data[::-1]
+    ranks = np.arange(1, len(sorted_data) + 1)
+    
+    # 1. 基本分布（ヒストグラム）
+    ax1 = plt.subplot(3, 3, 1)
+    hist_counts, hist_edges = np.histogram(data, bins=50)
+    plt.bar(hist_edges[:-1], hist_counts, width=np.diff(hist_edges), align='edge',
+            edgecolor='black', alpha=0.7, color='steelblue')
+    plt.xlabel(value_label, fontsize=11)
+    plt.ylabel('ゲーム数', fontsize=11)
+    plt.title(f'{value_label}の分布', fontsize=12, fontweight='bold')
+    plt.grid(True, alpha=0.3)
+    
+    # 2. 対数スケールヒストグラム
+    ax2 = plt.subplot(3, 3, 2)
+    # 対数軸では対数ビンで集計しないと、ほぼ全件が先頭のビンに入る
+    log_bins = np.logspace(np.log10(sorted_asc[0]), np.log10(sorted_data[0]), 51)
+    log_counts, _ = np.histogram(data, bins=log_bins)
+    plt.bar(log_bins[:-1], log_counts, width=np.diff(log_bins), align='edge',
+            edgecolor='black', alpha=0.7, color='coral')
+    plt.xlabel(f'{value_label} (log)', fontsize=11)
+    plt.ylabel('ゲーム数 (log)', fontsize=11)
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.title('対数スケール分布', fontsize=12, fontweight='bold')
+    plt.grid(True, alpha=0.3)
+    
+    # 3. ランク-値プロット (log-log)
+    ax3 = plt.subplot(3, 3, 3)
+    plt.scatter(ranks, sorted_data, s=10, alpha=0.5, color='darkgreen')
+    
+    # 回帰直線
+    log_ranks = np.log10(ranks)
+    log_predicted = metrics['slope'] * log_ranks + metrics['intercept']
+    predicted = 10 ** log_predicted
+    plt.plot(ranks, predicted, 'r-', linewidth=2, 
+             label=f'べき法則フィット\nα={metrics["alpha"]:.3f}\nR²={metrics["r_squared"]:.4f}')
+    
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.xlabel('ランク (log)', fontsize=11)
+    plt.ylabel(f'{value_label} (log)', fontsize=11)
+    plt.title(f'ランク-{value_label}プロット (log-log)', fontsize=12, fontweight='bold')
+    plt.legend(fontsize=9)
+    plt.grid(True, alpha=0.3)
+    
+    # 4. 累積分布関数 (CCDF)
+    ax4 = plt.subplot(3, 3, 4)
+    unique_values, ccdf = ccdf_points(sorted_asc)
+    
+    plt.scatter(unique_values, ccdf, s=10, alpha=0.5, color='purple')
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.xlabel(f'{value_label} (log)', fontsize=11)
+    plt.ylabel('P(X ≥ x)', fontsize=11)
+    plt.title('相補累積分布関数 (CCDF)', fontsize=12, fontweight='bold')
+    plt.grid(True, alpha=0.3)
+    
+    # 5. ローレンツ曲線
+    ax5 = plt.subplot(3, 3, 5)
+    cumsum = np.cumsum(sorted_asc)
+    cumsum_norm = cumsum / cumsum[-1]
+    x = np.linspace(0, 1, len(cumsum_norm))
+    
+    plt.plot(x, cumsum_norm, linewidth=2, color='darkblue', label='ローレンツ曲線')
+    plt.plot([0, 1], [0, 1], 'k--', linewidth=1, label='完全平等線')
+    
+    plt.fill_between(x, cumsum_norm, x, alpha=0.3, color='skyblue')
+    plt.xlabel('累積ゲーム割合', fontsize=11)
+    plt.ylabel(f'累積{value_label}割合', fontsize=11)
+    plt.title(f'ローレンツ曲線 (Gini={metrics["gini"]:.4f})', fontsize=12, fontweight='bold')
+    plt.legend(fontsize=9)
+    plt.grid(True, alpha=0.3)
+    
+    # 6. Q-Qプロット
+    ax6 = plt.subplot(3, 3, 6)
+    log_data = np.log10(sorted_data, dtype=np.float64)
+    theoretical_quantiles = np.linspace(log_data.min(), log_data.max(), len(log_data))
+    
+    plt.scatter(theoretical_quantiles, log_data, s=10, alpha=0.5, color='orange')
+    plt.plot([log_data.min(), log_data.max()], 
+             [log_data.min(), log_data.max()], 
+             'r--', linewidth=2, label='理論直線')
+    
+    plt.xlabel('理論分位点 (log)', fontsize=11)
+    plt.ylabel('実測分位点 (log)', fontsize=11)
+    plt.title('Q-Qプロット (べき分布)', fontsize=12, fontweight='bold')
+    plt.legend(fontsize=9)
+    plt.grid(True, alpha=0.3)
+    
+    # 7. 上位ゲームの集中度
+    ax7 = plt.subplot(3, 3, 7)
+    percentages = [1, 5, 10, 20, 50]
+    contributions = [
+        metrics['top_1_pct'] * 100,
+        metrics['top_5_pct'] * 100,
+        metrics['top_10_pct'] * 100,
+        metrics['pareto_20'] * 100,
+        metrics['top_50_pct'] * 100
+    ]
+    
+    bars = plt.bar(range(len(percentages)), contributions, 
+                   color=['#d62728', '#ff7f0e', '#2ca02c', '#1f77b4', '#9467bd'],
+                   edgecolor='black', linewidth=1.5)
+    plt.xticks(range(len(percentages)), [f'上位{p}%' for p in percentages])
+    plt.ylabel(f'総{value_label}に占める割合 (%)', fontsize=11)
+    plt.title(f'{value_label}の集中度', fontsize=12, fontweight='bold')
+    plt.grid(True, alpha=0.3, axis='y')
+    
+    # 値をバーの上に表示
+    for bar, val in zip(bars, contributions):
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                f'{val:.1f}%', ha='center', va='bottom', fontsize=9, fontweight='bold')
+    
+    # 8. 残差プロット
+    ax8 = plt.subplot(3, 3, 8)
+    log_ranks = np.log10(ranks)
+    log_values = np.log10(sorted_data, dtype=np.float64)
+    predicted_log = metrics['slope'] * log_ranks + metrics['intercept']
+    residuals = log_values - predicted_log
+    
+    plt.scatter(log_ranks, residuals, s=10, alpha=0.5, color='brown')
+    plt.axhline(y=0, color='r', linestyle='--', linewidth=2)
+    plt.xlabel('log(ランク)', fontsize=11)
+    plt.ylabel('残差', fontsize=11)
+    plt.title('残差プロット', fontsize=12, fontweight='bold')
+    plt.grid(True, alpha=0.3)
+    
+    # 9. 統計サマリー
+    ax9 = plt.subplot(3, 3, 9)
+    ax9.axis('off')
+    
+    summary_text = f"""
+【べき分布分析結果】
+
+べき指数 (α):     {metrics['alpha']:.3f}
+決定係数 (R²):    {metrics['r_squared']:.4f}
+Gini係数:         {metrics['gini']:.4f}
+
+【集中度】
+上位  1%:  {metrics['top_1_pct']*100:>5.1f}%
+上位  5%:  {metrics['top_5_pct']*100:>5.1f}%
+上位 10%:  {metrics['top_10_pct']*100:>5.1f}%
+上位 20%:  {metrics['pareto_20']*100:>5.1f}%
+
+【基本統計】
+データ数:  {len(data):>10,}
+最大値:    {np.max(data):>10,.0f}
+平均値:    {np.mean(data, dtype=np.float64):>10,.1f}
+中央値:    {np.median(data):>10,.0f}
+合計:      {np.sum(data, dtype=np.float64):>10,.0f}
+    """
+    
+    plt.text(0.1, 0.9, summary_text, transform=ax9.transAxes,
+             fontsize=10, verticalalignment='top', fontfamily='monospace',
+             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+    
+    plt.suptitle(title, fontsize=16, fontweight='bold', y=0.995)
+    plt.tight_layout()
+    
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"📊 グラフ保存: {output_path}")
+    
+    return fig
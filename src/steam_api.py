@@ -1,20 +1,25 @@
 import requests
+from requests.adapters import HTTPAdapter
+
+PLAYER_COUNT_URL = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
+
+# 呼び出しごとに TCP/TLS 接続を張り直さないよう、セッションをモジュールで共有
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_maxsize=16))
 
 def get_current_players(app_id):
     """現在のプレイヤー数を取得"""
-    url = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
-    params = {'appid': app_id}
-    
-    response = requests.get(url, params=params)
+    response = _session.get(PLAYER_COUNT_URL, params={'appid': app_id}, timeout=10)
     data = response.json()
-    
-    # 取得できるデータ: 
+
+    # 取得できるデータ:
     # - player_count: 現在のプレイヤー数
     # - result: APIレスポンスの成否
-    
+
     return data
 
-# 例:  Counter-Strike 2
-result = get_current_players(730)
-print(result)
-# 出力例: {'response': {'player_count': 850000, 'result': 1}}
\ No newline at end of file
+if __name__ == "__main__":
+    # 例:  Counter-Strike 2
+    result = get_current_players(730)
+    print(result)
+    # 出力例: {'response': {'player_count': 850000, 'result': 1}}
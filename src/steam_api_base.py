@@ -0,0 +1,181 @@
+"""
+Steam コレクター共通のアプリID取得処理
+"""
+
+import logging
+import random
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+try:
+    import ijson  # レスポンスを逐次解析し、数万件の dict を作らない
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+logger = logging.getLogger(__name__)
+
+
+class SteamAppIdMixin:
+    """
+    全アプリIDを取得するコレクター共通の処理
+    
+    self.session（requests.Session）、self.timeout、self.api_key を使用する。
+    """
+    
+    api_key = None  # APIキーを受け取らないコレクターでは旧APIを使う
+    
+    def get_all_app_ids(self) -> np.ndarray:
+        """全アプリIDを取得（約20万件を uint32 配列で保持）"""
+        logger.info("全アプリケーションリストを取得中...")
+        
+        if self.api_key:
+            return self._get_app_ids_via_store_service()
+        
+        try:
+            # 重複IDがあるとサンプリングが偏るため、順序を保って除去
+            unique_ids = dict.fromkeys(self._iter_legacy_app_ids())
+            
+            logger.info(f"{len(unique_ids):,}個のアプリIDを取得")
+            return np.fromiter(unique_ids, dtype=np.uint32, count=len(unique_ids))
+        except Exception as e:
+            logger.error(f"エラー: {e}")
+            return np.empty(0, dtype=np.uint32)
+    
+    def stream_sample_app_ids(self, sample_size: int, seed=None) -> List[int]:
+        """
+        アプリ一覧をダウンロードしながら sample_size 件を無作為に選ぶ（リザーバーサンプリング, Algorithm R）
+        
+        全件の配列を作らないので、保持するのは sample_size 件分と重複判定用のビット列だけで済む。
+        同じ一覧と seed なら同じ結果になる。取得に失敗した場合は空のリストを返す。
+        """
+        logger.info("全アプリケーションリストを取得しながらサンプリング中...")
+        rng = random.Random(seed)
+        reservoir = []
+        seen = bytearray()  # appid ごとに1ビット（重複IDで選ばれやすさが偏らないように）
+        n = 0
+        
+        try:
+            for appid in self._iter_app_ids():
+                byte, bit = divmod(appid, 8)
+                if byte >= len(seen):
+                    seen.extend(bytes(max(byte + 1 - len(seen), len(seen))))
+                if seen[byte] >> bit & 1:
+                    continue
+                seen[byte] |= 1 << bit
+                n += 1
+                
+                if len(reservoir) < sample_size:
+                    reservoir.append(appid)
+                else:
+                    j = rng.randrange(n)
+                    if j < sample_size:
+                        reservoir[j] = appid
+        except Exception as e:
+            logger.error(f"エラー: {e}")
+            return []
+        
+        # 先頭の方はダウンロード順のまま残るので並びを混ぜる
+        rng.shuffle(reservoir)
+        logger.info(f"🎯 {n:,}個から{len(reservoir):,}個をランダムサンプリングしました")
+        return reservoir
+    
+    def _iter_app_ids(self) -> Iterator[int]:
+        """アプリIDをダウンロードしながら1件ずつ返す（重複は除かない）"""
+        if self.api_key:
+            for appids in self._iter_store_service_pages():
+                yield from appids
+        else:
+            yield from self._iter_legacy_app_ids()
+    
+    def _iter_legacy_app_ids(self) -> Iterator[int]:
+        """ISteamApps/GetAppList のアプリIDを読みながら1件ずつ返す"""
+        url = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            
+            if HAS_IJSON:
+                response.raw.decode_content = True  # gzip を展開しながら読む
+                appids = ijson.items(response.raw, 'applist.apps.item.appid')
+            else:
+                apps = orjson.loads(response.content)['applist']['apps']
+                appids = (app.get('appid') for app in apps)
+            for appid in appids:
+                if appid:
+                    yield appid
+    
+    def _parse_store_page(self, resp) -> Tuple[List[int], Optional[int], bool]:
+        """IStoreService の1ページから (appidのリスト, last_appid, have_more_results) を取り出す"""
+        if not HAS_IJSON:
+            response_body = orjson.loads(resp.content).get('response', {})
+            appids = [app['appid'] for app in response_body.get('apps', [])]
+            return appids, response_body.get('last_appid'), response_body.get('have_more_results', False)
+        
+        appids = []
+        last_appid = None
+        has_more = False
+        resp.raw.decode_content = True  # gzip を展開しながら読む
+        for prefix, event, value in ijson.parse(resp.raw):
+            if prefix == 'response.apps.item.appid':
+                appids.append(value)
+            elif prefix == 'response.last_appid':
+                last_appid = value
+            elif prefix == 'response.have_more_results':
+                has_more = value
+        return appids, last_appid, has_more
+    
+    def _get_app_ids_via_store_service(self) -> np.ndarray:
+        """IStoreServiceでアプリID取得"""
+        app_ids = set()  # ページ境界で重複するIDを除去
+        for appids in self._iter_store_service_pages():
+            app_ids.update(appids)
+            logger.info(f"  現在 {len(app_ids)} 件...")
+        
+        if app_ids:
+            logger.info(f"{len(app_ids):,}個のアプリIDを取得")
+        
+        return np.fromiter(app_ids, dtype=np.uint32, count=len(app_ids))
+    
+    def _iter_store_service_pages(self) -> Iterator[List[int]]:
+        """
+        IStoreService のアプリIDをページごとに返す
+        
+        次ページのリクエストには前ページの last_appid が必要なため、ページは順番に取得する。
+        ページ数は数回程度なので待機は入れない。エラーが起きたらそこまでで止める。
+        """
+        url = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
+        last_appid = 0
+        has_more = True
+        
+        while has_more:
+            params = {
+                'key': self.api_key,
+                'include_games': 1,
+                'include_dlc': 0,
+                'include_software': 0,
+                'last_appid': last_appid,
+                'max_results': 50000
+            }
+            try:
+                with self.session.get(url, params=params, timeout=self.timeout, stream=True) as resp:
+                    resp.raise_for_status()
+                    appids, last_appid, has_more = self._parse_store_page(resp)
+            except Exception as e:
+                logger.error(f"エラー: {e}")
+                break
+            
+            if not appids:
+                break
+            yield appids
+    
+    def check_api_key(self) -> bool:
+        """APIキーが有効か1件だけ取得して確認"""
+        url = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
+        try:
+            resp = self.session.get(url, params={'key': self.api_key, 'max_results': 1}, timeout=self.timeout)
+            return resp.status_code == 200
+        except Exception as e:
+            logger.error(f"エラー: {e}")
+            return False
@@ -1,12 +1,75 @@
+import asyncio
+import httpx
+from aiolimiter import AsyncLimiter
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import orjson
+import shelve
+from concurrent.futures import ProcessPoolExecutor
 import time
 import random
+import os
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 import pandas as pd
 import logging
+from operator import itemgetter
 from typing import List, Dict, Optional
 
+import numpy as np
+
+from steam_api_base import SteamAppIdMixin
+
+# 同時処理数の AIMD 制御: 成功で ALPHA ずつ増やし、429/5xx で BETA 倍に減らす
+AIMD_ALPHA = 0.5
+AIMD_BETA = 0.5
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+
+# categories / genres の各要素から表示名を取り出す
+_get_description = itemgetter('description')
+
+# エンドポイント（呼び出しごとに組み立てない）
+PLAYER_COUNT_URL = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
+ACHIEVEMENTS_URL = "https://api.steampowered.com/ISteamUserStats/GetGlobalAchievementPercentagesForApp/v2/"
+APPDETAILS_URL = "https://store.steampowered.com/api/appdetails"
+# 価格は円で受け取り、使う項目だけ返させて応答を小さくする（カテゴリー・ジャンル名は英語になる）
+DETAILS_PARAMS_BASE = {'cc': 'jp', 'filters': 'basic,price_overview,categories,genres,metacritic'}
+
+# 詳細をまとめて並行取得する単位（件数）
+APPDETAILS_BATCH_SIZE = 50
+
+# 段と段の間のキューの上限（件数に関係なくメモリを一定に保つ）
+QUEUE_SIZE = 1024
+
+# 応答キャッシュ（再実行時に変わりにくいデータを取り直さない）
+# プレイヤー数は収集時点の値そのものが測定対象なのでキャッシュしない
+RESPONSE_CACHE_FILE = '.steam_cache'
+DETAILS_CACHE_TTL = 7 * 24 * 3600
+ACHIEVEMENTS_CACHE_TTL = 7 * 24 * 3600
+
+# 再試行の待ち時間の上限（秒）
+RETRY_MAX_WAIT = 30
+
+# app_id ごとの判定結果（game / not_game / unknown）。前回までに not_game と分かったIDは問い合わせない
+APP_STATUS_FILE = 'app_ids.json'
+
+# CSV / Excel に出力するカラムの順序
+COLUMN_ORDER = [
+    'app_id',
+    'player_count',
+    'type',
+    'is_free',
+    'categories',
+    'genres',
+    'price_jpy',
+    'metacritic_score',
+    'total_achievements',
+    'collected_at'
+]
+
 # ロギング設定
 logging.basicConfig(
     level=logging.INFO,
@@ -19,29 +82,118 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class SteamRandomCollector: 
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After ヘッダー（秒数 または HTTP日付）を待ち秒数に変換"""
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now().astimezone()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _extract_details(app_id: int, details: Dict) -> Dict:
+    """appdetails の data から必要な項目を取り出す（応答ごとに呼ばれるので .get は局所変数に束縛しておく）"""
+    g = details.get
+    is_free = g('is_free', False)
+    categories = g('categories')
+    genres = g('genres')
+    price_overview = g('price_overview')
+    metacritic = g('metacritic')
+    
+    return {
+        'app_id': app_id,
+        'type': g('type'),
+        'is_free': is_free,
+        'categories': list(map(_get_description, categories)) if categories else [],
+        'genres': list(map(_get_description, genres)) if genres else [],
+        # 価格（円）
+        'price_jpy': price_overview.get('final', 0) / 100 if price_overview else (0 if is_free else None),
+        # メタスコア
+        'metacritic_score': metacritic.get('score') if metacritic else None,
+    }
+
+def _parse_appdetails(app_ids: List[int], raw: bytes) -> Optional[Dict[int, Optional[Dict]]]:
+    """
+    appdetails の応答本文を解析し、app_id ごとの詳細（取得できなければ None）を返す
+    
+    プロセスプールで実行するので、インスタンスの状態には触れない純粋な関数にしておく。
+    応答に app_ids の一部しか含まれない場合は None を返す。
+    """
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not all(str(app_id) in data for app_id in app_ids):
+        return None
+    
+    results = {}
+    for app_id in app_ids:
+        entry = data[str(app_id)]
+        try:
+            results[app_id] = _extract_details(app_id, entry['data']) if entry and entry.get('success') else None
+        except (KeyError, TypeError, AttributeError):
+            results[app_id] = None
+    return results
+
+
+class SteamRandomCollector(SteamAppIdMixin):
     """Steam APIからランダムにゲームデータを収集"""
     
-    def __init__(self, delay=0.6, timeout=10, checkpoint_interval=100):
+    def __init__(self, delay=0.6, timeout=10, checkpoint_interval=100, concurrency=8, max_retries=3):
         """
         Args:
-            delay: API呼び出し間隔（秒）
+            delay: 同じホストへのAPI呼び出し間隔（秒）- ホストごとのトークンバケットの補充間隔
             timeout: リクエストタイムアウト（秒）
             checkpoint_interval: 何件ごとに中間保存するか
+            concurrency: 同時に処理するゲーム数の初期値（応答に応じて MIN_CONCURRENCY 〜 MAX_CONCURRENCY で増減）
+            max_retries: 429/5xx・通信エラー時の再試行回数
         """
         self. delay = delay
         self.timeout = timeout
         self.checkpoint_interval = checkpoint_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._limit = float(concurrency)  # 現在の同時処理数の上限（AIMD で増減）
+        self._in_flight = 0
+        self._slot_cond = None
         
+        # アプリ一覧の取得は同期の requests、ゲームごとの取得は httpx（HTTP/2）で並行実行
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent':  'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent':  'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Connection': 'keep-alive'
         })
+        # keep-alive 接続を使い回し、429/5xx は Retry-After に従ってアダプタ側で再試行
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                respect_retry_after_header=True
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.aio_session = None  # collect_bulk_async の間だけ有効
+        self._cache = None  # 応答キャッシュ（collect_bulk_async の間だけ開く）
+        self._parser_pool = None  # appdetails の解析用プロセスプール（collect_bulk_async の間だけ作る）
+        self.app_status = self._load_app_status()
+        # ホストごとのトークンバケット（最大10件のバーストを許し、平均は delay 秒に1件）
+        self._limiters = {
+            host: AsyncLimiter(max_rate=10, time_period=10 * delay)
+            for host in ('store.steampowered.com', 'api.steampowered.com')
+        }
         
         # 統計情報
         self. stats = {
             'total_requested': 0,
             'successful':  0,
+            'restored': 0,  # チェックポイントから引き継いだ件数（successful には含めない）
             'failed':  0,
             'with_players': 0,
             'with_metacritic': 0,
@@ -49,105 +201,186 @@ class SteamRandomCollector:
             'end_time': None
         }
     
-    def get_all_app_ids(self) -> List[int]:
-        """Steam上の全アプリケーションIDを取得"""
-        logger.info("📥 全アプリケーションリストを取得中...")
-        
-        # 複数のエンドポイントを試す
-        endpoints = [
-            "https://api.steampowered.com/ISteamApps/GetAppList/v2/",
-            "https://api.steampowered.com/ISteamApps/GetAppList/v0002/",
-            "https://api.steampowered.com/ISteamApps/GetAppList/v1/",
-        ]
-        
-        for url in endpoints:
-            try:
-                logger.info(f"試行中: {url}")
-                response = self.session.get(url, timeout=self.timeout)
-                response.raise_for_status()
-                
-                data = response.json()
-                apps = data['applist']['apps']
-                app_ids = [app['appid'] for app in apps if app.get('appid')]
-                
-                logger.info(f"✅ {len(app_ids):,}個のアプリケーションIDを取得しました")
-                logger.info(f"📊 app_id範囲: {min(app_ids)} 〜 {max(app_ids)}")
-                
-                return app_ids
-                
-            except Exception as e:
-                logger.warning(f"⚠️ {url} でエラー: {e}")
-                continue
-        
-        # すべて失敗した場合、ランダムなapp_idを生成
+    def get_all_app_ids(self) -> np.ndarray:
+        """Steam上の全アプリケーションIDを取得（取得できなければ候補IDを生成）"""
+        app_ids = super().get_all_app_ids()
+        if app_ids.size:
+            logger.info(f"📊 app_id範囲: {app_ids.min()} 〜 {app_ids.max()}")
+            # 前回までの判定結果は残し、初めて見るIDは unknown として記録
+            for app_id in app_ids.tolist():
+                self.app_status.setdefault(app_id, 'unknown')
+            self._save_app_status()
+            return app_ids
+        
+        # 取得に失敗した場合、ランダムなapp_idを生成
         logger.warning("⚠️ APIからの取得に失敗しました。ランダムなapp_idを生成します")
         logger.info("💡 Steam app_idは通常 10 〜 2,500,000 の範囲です")
         # よく使われる範囲のIDをランダムに生成
-        app_ids = list(range(10, 2500000, 10))
-        random.shuffle(app_ids)
+        app_ids = np.arange(10, 2500000, 10, dtype=np.uint32)
+        np.random.shuffle(app_ids)
         logger.info(f"✅ {len(app_ids):,}個のapp_id候補を生成しました")
         return app_ids
     
-    def random_sample_app_ids(self, all_app_ids: List[int], sample_size: int, seed=None) -> List[int]:
+    def _load_app_status(self) -> Dict[int, str]:
+        """前回までの app_id ごとの判定結果を読み込む"""
+        if not os.path.exists(APP_STATUS_FILE):
+            return {}
+        try:
+            with open(APP_STATUS_FILE, 'rb') as f:
+                return {int(app_id): status for app_id, status in orjson.loads(f.read()).items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ {APP_STATUS_FILE} の読み込みエラー: {e}")
+            return {}
+    
+    def _save_app_status(self):
+        """app_id ごとの判定結果を保存（書き込み途中で止まっても前回の内容を壊さない）"""
+        tmp_file = APP_STATUS_FILE + '.tmp'
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(self.app_status, option=orjson.OPT_NON_STR_KEYS))
+            os.replace(tmp_file, APP_STATUS_FILE)
+        except OSError as e:
+            logger.error(f"{APP_STATUS_FILE} の保存エラー: {e}")
+    
+    def stream_sample_app_ids(self, sample_size: int, seed=None) -> List[int]:
         """
-        ランダムにapp_idをサンプリング
+        アプリ一覧をダウンロードしながらランダムにapp_idをサンプリング（取得できなければ候補IDから選ぶ）
         
         Args:
-            all_app_ids: 全アプリIDのリスト
             sample_size: サンプル数
             seed: 乱数シード（再現性が必要な場合に指定）
         """
         if seed is not None:
-            random.seed(seed)
-            logger.info(f"🎲 乱数シード:  {seed}（結果の再現が可能）")
+            logger.info(f"🎲 乱数シード: {seed}（結果の再現が可能）")
+        
+        sampled_ids = super().stream_sample_app_ids(sample_size, seed=seed)
+        if not sampled_ids:
+            # 取得に失敗した場合、よく使われる範囲のIDから選ぶ
+            logger.warning("⚠️ APIからの取得に失敗しました。ランダムなapp_idを生成します")
+            logger.info("💡 Steam app_idは通常 10 〜 2,500,000 の範囲です")
+            candidates = range(10, 2500000, 10)
+            sampled_ids = random.Random(seed).sample(candidates, min(sample_size, len(candidates)))
+        
+        # 前回までの判定結果は残し、初めて見るIDは unknown として記録
+        for app_id in sampled_ids:
+            self.app_status.setdefault(app_id, 'unknown')
+        self._save_app_status()
+        
+        if sampled_ids:
+            logger.info(f"📊 サンプルID範囲: {min(sampled_ids)} 〜 {max(sampled_ids)}")
+        return sampled_ids
+    
+    async def _get_json(self, url: str, params: Dict) -> Optional[Dict]:
+        """GETして、200 ならJSONを返す"""
+        raw = await self._get_raw(url, params)
+        return orjson.loads(raw) if raw is not None else None
+    
+    async def _get_raw(self, url: str, params: Dict) -> Optional[bytes]:
+        """
+        GETして、200 なら応答本文を返す（送信前にホストのトークンを1つ消費する）
         
-        actual_sample_size = min(sample_size, len(all_app_ids))
-        sampled_ids = random.sample(all_app_ids, actual_sample_size)
+        429/5xx・通信エラーは Retry-After があれば従い、なければ上限付きの
+        指数バックオフにジッターを加えて再試行する。待つ間も枠は持ったまま。
+        """
+        limiter = self._limiters[url.split('/', 3)[2]]
         
-        logger.info(f"🎯 {len(all_app_ids):,}個から{actual_sample_size: ,}個をランダムサンプリングしました")
-        logger.info(f"📊 サンプルID範囲: {min(sampled_ids)} 〜 {max(sampled_ids)}")
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with limiter:
+                    response = await self.aio_session.get(url, params=params)
+                status = response.status_code
+                if status == 200:
+                    data = response.content
+                elif status == 429:
+                    retry_after = response.headers.get('Retry-After')
+                
+                await self._on_result(status)
+                if status == 200:
+                    return data
+                if status != 429 and status < 500:
+                    return None
+                reason = f"HTTP {status}"
+            except httpx.TransportError as e:
+                reason = type(e).__name__
+            
+            if attempt < self.max_retries:
+                wait = _parse_retry_after(retry_after)
+                if wait is None:
+                    wait = min(RETRY_MAX_WAIT, 2 ** attempt) + random.uniform(0, 1)
+                logger.debug(f"{reason}: {wait:.1f}秒後に再試行 ({url} {params})")
+                await asyncio.sleep(wait)
         
-        return sampled_ids
+        return None
+    
+    def _cache_get(self, key: str, ttl: float):
+        """キャッシュから有効期限内の値を取り出す（なければ None）"""
+        entry = self._cache.get(key) if self._cache is not None else None
+        if entry is not None and time.time() - entry[0] < ttl:
+            return entry[1]
+        return None
     
-    def get_player_count(self, app_id: int) -> Optional[int]:
+    def _cache_set(self, key: str, value):
+        """保存時刻と一緒にキャッシュへ書き込む"""
+        if self._cache is not None:
+            self._cache[key] = (time.time(), value)
+    
+    async def _acquire_slot(self):
+        """同時処理数が現在の上限を下回るまで待ってから枠を取る"""
+        async with self._slot_cond:
+            await self._slot_cond.wait_for(lambda: self._in_flight < int(self._limit))
+            self._in_flight += 1
+    
+    async def _release_slot(self):
+        """枠を返して待っているタスクを起こす"""
+        async with self._slot_cond:
+            self._in_flight -= 1
+            self._slot_cond.notify_all()
+    
+    async def _on_result(self, status: int):
+        """応答に応じて同時処理数の上限を増減（AIMD）"""
+        if status == 429 or status >= 500:
+            new_limit = max(MIN_CONCURRENCY, self._limit * AIMD_BETA)
+            if int(new_limit) < int(self._limit):
+                logger.warning(f"⚠️ HTTP {status}: 同時処理数を {int(new_limit)} に下げます")
+            self._limit = new_limit
+        elif self._limit < MAX_CONCURRENCY:
+            self._limit = min(MAX_CONCURRENCY, self._limit + AIMD_ALPHA)
+            async with self._slot_cond:
+                self._slot_cond.notify_all()
+    
+    async def get_player_count(self, app_id: int) -> Optional[int]:
         """現在のプレイヤー数を取得"""
         try:
-            url = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
-            response = self.session.get(
-                url,
-                params={'appid': app_id},
-                timeout=self.timeout
-            )
+            data = await self._get_json(PLAYER_COUNT_URL, {'appid': app_id})
             
-            if response. status_code == 200:
-                data = response.json()
-                if data.get('response', {}).get('result') == 1:
-                    return data['response']['player_count']
-        except: 
-            pass
+            if data and data.get('response', {}).get('result') == 1:
+                return data['response']['player_count']
+        except (ValueError, KeyError, TypeError) as e:
+            logger.debug(f"AppID {app_id}: {e}")
         
         return None
     
-    def get_achievement_count(self, app_id: int) -> Optional[int]:
+    async def get_achievement_count(self, app_id: int) -> Optional[int]:
         """実績数を取得"""
-        try: 
-            url = "https://api.steampowered.com/ISteamUserStats/GetGlobalAchievementPercentagesForApp/v2/"
-            response = self.session.get(
-                url,
-                params={'gameid': app_id},
-                timeout=self.timeout
-            )
+        cache_key = f'achievements:{app_id}'
+        cached = self._cache_get(cache_key, ACHIEVEMENTS_CACHE_TTL)
+        if cached is not None:
+            return cached
+        
+        try:
+            data = await self._get_json(ACHIEVEMENTS_URL, {'gameid': app_id})
             
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
                 achievements = data.get('achievementpercentages', {}).get('achievements', [])
+                self._cache_set(cache_key, len(achievements))
                 return len(achievements)
-        except:
-            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logger.debug(f"AppID {app_id}: {e}")
         
         return None
     
-    def get_game_details(self, app_id: int) -> Optional[Dict]:
+    async def get_game_details(self, app_id: int) -> Optional[Dict]:
         """
         指定された項目のみを取得: 
         - type
@@ -156,152 +389,302 @@ class SteamRandomCollector:
         - genres
         - price_jpy
         - metacritic_score
+        
+        ゲーム以外の結果もキャッシュし、再実行時はHTTPを使わずに除外できるようにする。
         """
-        try: 
-            url = "https://store.steampowered.com/api/appdetails"
-            response = self.session.get(
-                url,
-                params={'appids': app_id, 'l': 'japanese'},
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data.get(str(app_id), {}).get('success'):
-                    details = data[str(app_id)]['data']
-                    
-                    result = {
-                        'app_id': app_id,
-                        'type': details.get('type'),
-                        'is_free':  details.get('is_free', False),
-                    }
-                    
-                    # カテゴリー
-                    categories = details.get('categories', [])
-                    result['categories'] = [cat.get('description') for cat in categories] if categories else []
-                    
-                    # ジャンル
-                    genres = details.get('genres', [])
-                    result['genres'] = [genre.get('description') for genre in genres] if genres else []
-                    
-                    # 価格（円）
-                    price_overview = details.get('price_overview')
-                    if price_overview: 
-                        result['price_jpy'] = price_overview.get('final', 0) / 100
-                    else:
-                        result['price_jpy'] = 0 if result['is_free'] else None
-                    
-                    # メタスコア
-                    metacritic = details.get('metacritic')
-                    result['metacritic_score'] = metacritic.get('score') if metacritic else None
-                    
-                    return result
-                    
-        except Exception as e: 
-            logger.debug(f"詳細取得エラー (AppID {app_id}): {e}")
+        cache_key = f'appdetails:{app_id}'
+        cached = self._cache_get(cache_key, DETAILS_CACHE_TTL)
+        if cached is not None:
+            return cached
         
-        return None
+        raw = await self._get_raw(APPDETAILS_URL, {'appids': app_id, **DETAILS_PARAMS_BASE})
+        if raw is None:
+            return None
+        
+        parsed = await self._parse_appdetails([app_id], raw)
+        result = parsed.get(app_id) if parsed else None
+        if result is not None:
+            self._cache_set(cache_key, result)
+        else:
+            logger.debug(f"詳細取得エラー (AppID {app_id})")
+        return result
+    
+    async def _parse_appdetails(self, app_ids: List[int], raw: bytes) -> Optional[Dict[int, Optional[Dict]]]:
+        """応答の解析（_parse_appdetails）をイベントループの外のプロセスプールで実行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parser_pool, _parse_appdetails, app_ids, raw)
     
-    def collect_single_game(self, app_id: int) -> Optional[Dict]:
-        """1つのゲームの全データを収集"""
+    async def get_game_details_batch(self, app_ids: List[int]) -> Dict[int, Optional[Dict]]:
+        """
+        複数IDの詳細を並行して取得し、app_id ごとの詳細を返す
         
-        # 1. ゲーム詳細を取得
-        game_data = self.get_game_details(app_id)
+        appdetails は filters=price_overview 単独のときしか複数ID指定に応えず、それでは type が
+        分からないため、1件ずつ問い合わせる。キャッシュ済みのIDは問い合わせず、
+        問い合わせは1件ごとに AIMD の枠を取って行う。
+        """
+        results = {}
+        missing = []
+        for app_id in app_ids:
+            cached = self._cache_get(f'appdetails:{app_id}', DETAILS_CACHE_TTL)
+            if cached is not None:
+                results[app_id] = cached
+            else:
+                missing.append(app_id)
+        if not missing:
+            return results
         
-        if not game_data: 
-            return None
+        async def fetch(app_id):
+            await self._acquire_slot()
+            try:
+                return await self.get_game_details(app_id)
+            finally:
+                await self._release_slot()
+        
+        details = await asyncio.gather(*[fetch(app_id) for app_id in missing])
+        results.update(zip(missing, details))
+        return results
+    
+    async def collect_single_game(self, app_id: int, game_data: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        1つのゲームの全データを収集
+        
+        game_data（get_game_details_batch で取得済みの詳細）を渡した場合は詳細の取得を省く。
+        3つのエンドポイントは互いに依存しないので同時に問い合わせ、
+        ゲームでないと分かった時点で残りの問い合わせを取り消す。
+        """
+        players_task = asyncio.create_task(self.get_player_count(app_id))
+        achievements_task = asyncio.create_task(self.get_achievement_count(app_id))
+        
+        # 1. ゲーム詳細を取得
+        if game_data is None:
+            game_data = await self.get_game_details(app_id)
         
         # ゲームタイプのみをフィルタリング
-        if game_data.get('type') != 'game':
+        if not game_data or game_data.get('type') != 'game':
+            players_task.cancel()
+            achievements_task.cancel()
             return None
         
-        time. sleep(0.2)
-        
-        # 2. プレイヤー数を取得
-        player_count = self.get_player_count(app_id)
+        # 2. プレイヤー数と 3. 実績数（詳細の取得中に並行して問い合わせ済み）
+        player_count, achievement_count = await asyncio.gather(players_task, achievements_task)
         game_data['player_count'] = player_count
         if player_count is not None and player_count > 0:
             self.stats['with_players'] += 1
         
-        time.sleep(0.2)
-        
-        # 3. 実績数を取得
-        achievement_count = self.get_achievement_count(app_id)
         game_data['total_achievements'] = achievement_count
         
         # メタスコア統計
         if game_data.get('metacritic_score'):
             self.stats['with_metacritic'] += 1
         
-        # 収集日時
-        game_data['collected_at'] = datetime.now().isoformat()
+        # 収集日時（UNIX秒。ISO文字列には DataFrame にまとめるときに一括変換する）
+        game_data['collected_at'] = time.time()
         
         return game_data
     
-    def collect_bulk(self, app_ids: List[int], output_prefix='steam_random') -> List[Dict]:
+    async def iter_collected(self, app_ids: List[int]):
+        """
+        app_ids を1件ずつ処理し、終わった順に (app_id, game_data) を返す非同期ジェネレーター
+        
+        appdetails を APPDETAILS_BATCH_SIZE 件ずつ並行して取得する段と、ゲームだけプレイヤー数・実績を
+        取得するワーカーを上限付きのキューでつなぐ。下流が詰まれば上流が待つので、件数に関係なく
+        メモリ上に持つのは処理中の分だけになる。ゲームでないもの・取得できなかったものは game_data=None。
+        aio_session などは呼び出し側（collect_bulk_async）で用意しておくこと。
+        """
+        game_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        result_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        
+        async def details_stage():
+            for j in range(0, len(app_ids), APPDETAILS_BATCH_SIZE):
+                batch = app_ids[j:j + APPDETAILS_BATCH_SIZE]
+                details = await self.get_game_details_batch(batch)
+                
+                for app_id in batch:
+                    d = details.get(app_id)
+                    # 取得できなかったもの（通信エラー等）は unknown のまま次回も問い合わせる
+                    if d:
+                        self.app_status[app_id] = 'game' if d.get('type') == 'game' else 'not_game'
+                    if d and d.get('type') == 'game':
+                        await game_queue.put((app_id, d))
+                    else:
+                        await result_queue.put((app_id, None))
+            for _ in range(MAX_CONCURRENCY):
+                await game_queue.put(None)  # ワーカー終了の合図
+        
+        async def worker():
+            while True:
+                item = await game_queue.get()
+                if item is None:
+                    return
+                app_id, d = item
+                await self._acquire_slot()
+                try:
+                    game_data = await self.collect_single_game(app_id, d)
+                finally:
+                    await self._release_slot()
+                await result_queue.put((app_id, game_data))
+        
+        # 同時に処理する数は AIMD の枠で決まるので、ワーカーは上限の数だけ用意しておく
+        stages = [asyncio.create_task(details_stage())]
+        stages += [asyncio.create_task(worker()) for _ in range(MAX_CONCURRENCY)]
+        
+        async def next_result():
+            # 段が例外で止まると結果が届かず待ち続けるので、段の終了も一緒に待って例外を伝える
+            getter = asyncio.ensure_future(result_queue.get())
+            try:
+                while not getter.done():
+                    running = [task for task in stages if not task.done()]
+                    await asyncio.wait([getter, *running], return_when=asyncio.FIRST_COMPLETED)
+                    for task in stages:
+                        if task.done() and not task.cancelled() and task.exception() is not None:
+                            raise task.exception()
+                return getter.result()
+            finally:
+                getter.cancel()
+        
+        try:
+            for _ in range(len(app_ids)):
+                yield await next_result()
+        finally:
+            # 途中で止めた場合は残りの段を止める
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+    
+    def collect_bulk(self, app_ids: List[int], output_prefix='steam_random') -> pd.DataFrame:
+        """大量のゲームデータを収集（collect_bulk_async の同期版）"""
+        return asyncio.run(self.collect_bulk_async(app_ids, output_prefix))
+    
+    async def collect_bulk_async(self, app_ids: List[int], output_prefix='steam_random') -> pd.DataFrame:
         """
-        大量のゲームデータを収集
+        大量のゲームデータを並行収集
+        
+        iter_collected から終わった順に結果を受け取り、収集できたゲームは {output_prefix}.jsonl に
+        1行ずつ追記して checkpoint_interval 件ごとにディスクへ書き出す。結果はメモリに溜めず、
+        最後にチェックポイントを読み直して DataFrame にまとめる。
         """
+        # 前回までにゲームでないと分かったIDは問い合わせない
+        known_ids = len(app_ids)
+        app_ids = [app_id for app_id in app_ids if self.app_status.get(app_id) != 'not_game']
+        if len(app_ids) < known_ids:
+            logger.info(f"⏭️  ゲーム以外と判定済みの {known_ids - len(app_ids):,}件をスキップします")
+        
+        # 同じ出力先のチェックポイントがあれば、収集済みのゲームを引き継いで残りだけ集める
+        done_ids = set()
+        checkpoint_file = f'{output_prefix}.jsonl'
+        if os.path.exists(checkpoint_file):
+            done_ids = {game['app_id'] for game in self._load_checkpoint(checkpoint_file)}
+            app_ids = [app_id for app_id in app_ids if app_id not in done_ids]
+            logger.info(f"🔄 {checkpoint_file} から{len(done_ids):,}件のデータを復元しました")
+        
         self.stats['total_requested'] = len(app_ids)
+        self.stats['restored'] = len(done_ids)
         self.stats['start_time'] = datetime.now()
+        start_mono = time.monotonic()
         
+        estimated = len(app_ids) * self.delay  # 1ゲームにつきストアAPIを1回呼ぶ
         logger.info("="*70)
-        logger.info(f"🚀 {len(app_ids):,}ゲームのデータ収集を開始します")
-        logger.info(f"⏱️  推定所要時間: {len(app_ids) * self.delay / 60:.1f}分 ({len(app_ids) * self.delay / 3600:.1f}時間)")
+        logger.info(f"🚀 {len(app_ids):,}ゲームのデータ収集を開始します（同時 {int(self._limit)} 件から自動調整）")
+        logger.info(f"⏱️  推定所要時間: {estimated / 60:.1f}分 ({estimated / 3600:.1f}時間)")
         logger.info("="*70)
         
-        all_data = []
-        
-        for i, app_id in enumerate(app_ids, 1):
-            # 進捗表示
-            if i % 50 == 0 or i == 1:
-                elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
-                speed = i / elapsed if elapsed > 0 else 0
-                remaining = (len(app_ids) - i) / speed if speed > 0 else 0
-                
-                logger. info(f"\n{'='*70}")
-                logger.info(f"進捗: {i: ,}/{len(app_ids):,} ({i/len(app_ids)*100:.1f}%)")
-                logger.info(f"成功: {self.stats['successful']:,} | 失敗: {self. stats['failed']:,}")
-                logger.info(f"速度: {speed:.2f}ゲーム/秒")
-                logger.info(f"残り時間: 約{remaining/60:.1f}分")
-                logger.info(f"{'='*70}")
-            
-            # データ収集
-            game_data = self.collect_single_game(app_id)
-            
-            if game_data:
-                all_data.append(game_data)
-                self.stats['successful'] += 1
-                
-                if i % 10 == 0:
-                    logger.info(f"✅ [{i}] AppID {app_id}: {self.stats['successful']}件収集完了")
-            else:
-                self.stats['failed'] += 1
-                logger.debug(f"⚠️ [{i}] AppID {app_id}: スキップ")
-            
-            # チェックポイント保存
-            if i % self.checkpoint_interval == 0:
-                checkpoint_file = f'{output_prefix}_checkpoint_{i}. json'
-                self._save_checkpoint(all_data, checkpoint_file)
-                logger.info(f"💾 チェックポイント保存: {checkpoint_file}")
-            
-            # レート制限対策
-            if i < len(app_ids):
-                time.sleep(self. delay)
+        # HTTP/2 でホストごとの1本の接続に多重化し、TLS ハンドシェイクを使い回す
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=75)
+        # Connection ヘッダーは HTTP/2 では使えないので User-Agent だけ引き継ぐ
+        headers = {'User-Agent': self.session.headers['User-Agent']}
+        self._slot_cond = asyncio.Condition()
+        self._cache = shelve.open(RESPONSE_CACHE_FILE)
+        self._parser_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        
+        async with httpx.AsyncClient(http2=True, limits=limits, timeout=self.timeout, headers=headers) as session:
+            self.aio_session = session
+            checkpoint = open(checkpoint_file, 'ab')
+            i = 0
+            collected = self.iter_collected(app_ids)
+            try:
+                async for app_id, game_data in collected:
+                    i += 1
+                    
+                    # 進捗表示
+                    if i % 50 == 0 or i == 1:
+                        elapsed = time.monotonic() - start_mono
+                        speed = i / elapsed if elapsed > 0 else 0
+                        remaining = (len(app_ids) - i) / speed if speed > 0 else 0
+                        
+                        logger.info(f"\n{'='*70}")
+                        logger.info(f"進捗: {i:,}/{len(app_ids):,} ({i/len(app_ids)*100:.1f}%)")
+                        logger.info(f"成功: {self.stats['successful']:,} | 失敗: {self.stats['failed']:,}")
+                        logger.info(f"速度: {speed:.2f}ゲーム/秒")
+                        logger.info(f"残り時間: 約{remaining/60:.1f}分")
+                        logger.info(f"{'='*70}")
+                    
+                    if game_data:
+                        checkpoint.write(orjson.dumps(game_data, option=orjson.OPT_APPEND_NEWLINE))
+                        self.stats['successful'] += 1
+                        
+                        if i % 10 == 0:
+                            logger.info(f"✅ [{i}] AppID {app_id}: {self.stats['successful']}件収集完了")
+                    else:
+                        self.stats['failed'] += 1
+                        logger.debug(f"⚠️ [{i}] AppID {app_id}: スキップ")
+                    
+                    # チェックポイント保存
+                    if i % self.checkpoint_interval == 0:
+                        checkpoint.flush()
+                        logger.info(f"💾 チェックポイント保存: {checkpoint_file}")
+            finally:
+                # 中断時は取得中の段を止めてからセッションを閉じる
+                await collected.aclose()
+                self.aio_session = None
+                checkpoint.close()
+                self._save_app_status()
+                self._cache.close()
+                self._cache = None
+                self._parser_pool.shutdown()
+                self._parser_pool = None
         
         self.stats['end_time'] = datetime.now()
         self._print_final_stats()
         
-        return all_data
-    
-    def _save_checkpoint(self, data: List[Dict], filename: str):
-        """中間保存"""
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"チェックポイント保存エラー: {e}")
+        # 収集中は結果をメモリに溜めず、最後にチェックポイントから DataFrame を作る
+        cols = {col: [] for col in COLUMN_ORDER}
+        for game in self._load_checkpoint(checkpoint_file):
+            self._append_row(cols, game)
+        return self._with_iso_timestamps(pd.DataFrame(cols))
+    
+    def _with_iso_timestamps(self, df: pd.DataFrame) -> pd.DataFrame:
+        """collected_at（UNIX秒）をローカル時刻のISO文字列に一括変換"""
+        if len(df):
+            utc_offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+            return df.assign(collected_at=pd.to_datetime(df['collected_at'] + utc_offset, unit='s').dt.strftime('%Y-%m-%dT%H:%M:%S'))
+        return df
+    
+    def _append_row(self, cols: Dict[str, List], game: Dict):
+        """1ゲーム分の値を列ごとのリストに追加（categories / genres はここで | 区切りの文字列にする）"""
+        for col in COLUMN_ORDER:
+            value = game.get(col)
+            if isinstance(value, list):
+                value = '|'.join(value)
+            cols[col].append(value)
+    
+    def _load_checkpoint(self, filename: str) -> List[Dict]:
+        """JSONL のチェックポイントを読み込む（書き込み途中で切れた末尾の行は切り詰める）"""
+        data = []
+        valid_size = 0
+        with open(filename, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    data.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    break
+                valid_size += len(line)
+        if valid_size < os.path.getsize(filename):
+            logger.warning(f"⚠️ {filename} の末尾の不完全な行を切り詰めます")
+            with open(filename, 'r+b') as f:
+                f.truncate(valid_size)
+        return data
     
     def _print_final_stats(self):
         """最終統計を表示"""
@@ -313,127 +696,77 @@ class SteamRandomCollector:
         logger.info(f"総リクエスト数:      {self.stats['total_requested']:,}")
         logger.info(f"成功:                {self.stats['successful']:,}")
         logger.info(f"失敗:               {self.stats['failed']:,}")
-        logger.info(f"成功率:             {self.stats['successful']/self.stats['total_requested']*100:.1f}%")
+        if self.stats['restored']:
+            logger.info(f"復元:               {self.stats['restored']:,}（チェックポイントから引き継ぎ）")
+        logger.info(f"成功率:             {self.stats['successful']/max(self.stats['total_requested'], 1)*100:.1f}%")
         logger.info(f"プレイヤー数あり:   {self.stats['with_players']: ,} ({self.stats['with_players']/max(self.stats['successful'], 1)*100:.1f}%)")
         logger.info(f"メタスコアあり:     {self.stats['with_metacritic']:,} ({self.stats['with_metacritic']/max(self.stats['successful'], 1)*100:.1f}%)")
         logger.info(f"処理時間:           {duration:.1f}秒 ({duration/60:.1f}分 / {duration/3600:.2f}時間)")
-        logger.info(f"平均速度:           {self.stats['successful']/duration:.2f}ゲーム/秒")
+        logger.info(f"平均速度:           {self.stats['successful']/max(duration, 1e-9):.2f}ゲーム/秒")
         logger.info("="*70)
     
-    def save_to_json(self, data: List[Dict], filename: str):
+    def save_to_json(self, data: pd.DataFrame, filename: str):
         """JSONファイルに保存"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data.to_dict('records'), option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
         logger.info(f"💾 JSON保存完了: {filename} ({len(data):,}件)")
     
-    def save_to_csv(self, data: List[Dict], filename: str):
+    def save_to_csv(self, data: pd.DataFrame, filename: str):
         """CSVファイルに保存"""
-        if data:
-            # リスト型のフィールドを文字列に変換
-            data_for_csv = []
-            for game in data:
-                game_copy = game.copy()
-                if isinstance(game_copy.get('categories'), list):
-                    game_copy['categories'] = '|'.join(game_copy['categories'])
-                if isinstance(game_copy.get('genres'), list):
-                    game_copy['genres'] = '|'. join(game_copy['genres'])
-                data_for_csv.append(game_copy)
-            
-            df = pd.DataFrame(data_for_csv)
-            
-            # カ���ムの順序を指定
-            column_order = [
-                'app_id',
-                'player_count',
-                'type',
-                'is_free',
-                'categories',
-                'genres',
-                'price_jpy',
-                'metacritic_score',
-                'total_achievements',
-                'collected_at'
-            ]
-            
-            existing_columns = [col for col in column_order if col in df.columns]
-            df = df[existing_columns]
-            
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
+        if not data.empty:
+            data.to_csv(filename, index=False, encoding='utf-8-sig')
             logger.info(f"💾 CSV保存完了: {filename} ({len(data):,}件)")
     
-    def save_to_excel(self, data: List[Dict], filename: str):
+    def save_to_excel(self, data: pd.DataFrame, filename: str):
         """Excelファイルに保存"""
-        if data:
-            data_for_excel = []
-            for game in data:
-                game_copy = game.copy()
-                if isinstance(game_copy.get('categories'), list):
-                    game_copy['categories'] = '|'.join(game_copy['categories'])
-                if isinstance(game_copy.get('genres'), list):
-                    game_copy['genres'] = '|'.join(game_copy['genres'])
-                data_for_excel.append(game_copy)
-            
-            df = pd.DataFrame(data_for_excel)
-            
-            column_order = [
-                'app_id',
-                'player_count',
-                'type',
-                'is_free',
-                'categories',
-                'genres',
-                'price_jpy',
-                'metacritic_score',
-                'total_achievements',
-                'collected_at'
-            ]
-            
-            existing_columns = [col for col in column_order if col in df.columns]
-            df = df[existing_columns]
-            
-            df.to_excel(filename, index=False, engine='openpyxl')
+        if not data.empty:
+            data.to_excel(filename, index=False, engine='openpyxl')
             logger.info(f"💾 Excel保存完了:  {filename} ({len(data):,}件)")
 
 
-def print_data_summary(data: List[Dict]):
+def print_data_summary(df: pd.DataFrame):
     """収集データの簡易分析"""
     print("\n" + "="*70)
     print("📈 データ分析サマリー")
     print("="*70)
     
-    total = len(data)
-    free_games = sum(1 for g in data if g.get('is_free'))
-    with_price = sum(1 for g in data if g.get('price_jpy') and g['price_jpy'] > 0)
-    with_metacritic = sum(1 for g in data if g. get('metacritic_score'))
-    with_players = sum(1 for g in data if g.get('player_count') and g['player_count'] > 0)
-    with_achievements = sum(1 for g in data if g.get('total_achievements'))
+    # 条件ごとの真偽値マスクを一度だけ作り、件数はその合計で数える
+    total = len(df)
+    price = pd.to_numeric(df['price_jpy'], errors='coerce')
+    scores = pd.to_numeric(df['metacritic_score'], errors='coerce')
+    has_price = price > 0
+    has_metacritic = scores > 0
+    free_games = int(df['is_free'].eq(True).sum())
+    with_price = int(has_price.sum())
+    with_metacritic = int(has_metacritic.sum())
+    with_players = int((pd.to_numeric(df['player_count'], errors='coerce') > 0).sum())
+    with_achievements = int((pd.to_numeric(df['total_achievements'], errors='coerce') > 0).sum())
     
     print(f"総ゲーム数:            {total:,}")
     print(f"無料ゲーム:            {free_games:,} ({free_games/total*100:.1f}%)")
     print(f"有料ゲーム:           {with_price:,} ({with_price/total*100:.1f}%)")
-    print(f"メタスコアあり:       {with_metacritic:,} ({with_metacritic/total*100:. 1f}%)")
+    print(f"メタスコアあり:       {with_metacritic:,} ({with_metacritic/total*100:.1f}%)")
     print(f"プレイヤー数あり:     {with_players:,} ({with_players/total*100:.1f}%)")
-    print(f"実績あり:             {with_achievements: ,} ({with_achievements/total*100:.1f}%)")
+    print(f"実績あり:             {with_achievements:,} ({with_achievements/total*100:.1f}%)")
     
     # 価格統計
-    prices = [g['price_jpy'] for g in data if g.get('price_jpy') and g['price_jpy'] > 0]
-    if prices:
+    if with_price:
+        price_stats = price[has_price].agg(['mean', 'max', 'min'])
         print(f"\n価格統計:")
-        print(f"  平均価格:    ¥{sum(prices)/len(prices):,.0f}")
-        print(f"  最高価格:    ¥{max(prices):,.0f}")
-        print(f"  最低価格:    ¥{min(prices):,.0f}")
+        print(f"  平均価格:    ¥{price_stats['mean']:,.0f}")
+        print(f"  最高価格:    ¥{price_stats['max']:,.0f}")
+        print(f"  最低価格:    ¥{price_stats['min']:,.0f}")
     
     # メタスコア統計
-    scores = [g['metacritic_score'] for g in data if g.get('metacritic_score')]
-    if scores:
+    if with_metacritic:
+        score_stats = scores[has_metacritic].agg(['mean', 'max', 'min'])
         print(f"\nメタスコア統計:")
-        print(f"  平均スコア:  {sum(scores)/len(scores):.1f}")
-        print(f"  最高スコア:  {max(scores)}")
-        print(f"  最低スコア:  {min(scores)}")
+        print(f"  平均スコア:  {score_stats['mean']:.1f}")
+        print(f"  最高スコア:  {score_stats['max']:.0f}")
+        print(f"  最低スコア:  {score_stats['min']:.0f}")
     
     print("="*70)
 
-
 def main():
     """メイン実行関数"""
     
@@ -459,15 +792,6 @@ def main():
         checkpoint_interval=100
     )
     
-    # 全アプリIDを取得
-    all_app_ids = collector.get_all_app_ids()
-    
-    if not all_app_ids: 
-        logger.error("アプリIDの取得に失敗しました")
-        return
-    
-    print(f"\n📊 利用可能なアプリID数: {len(all_app_ids):,}")
-    
     # 収集数を選択
     print("\n収集数を選択:")
     print("1. 100ゲーム（テスト用 - 約1-2分）")
@@ -497,11 +821,11 @@ def main():
     if use_seed:
         seed = int(input("シード値を入力（整数）: "))
     
-    # ランダムサンプリング
-    app_ids_to_collect = collector.random_sample_app_ids(all_app_ids, target_count, seed=seed)
+    # アプリ一覧をダウンロードしながらランダムサンプリング
+    app_ids_to_collect = collector.stream_sample_app_ids(target_count, seed=seed)
     
     # 確認
-    estimated_time = len(app_ids_to_collect) * 0.6 / 60
+    estimated_time = len(app_ids_to_collect) * collector.delay / 60
     print(f"\n⏱️  推定所要時間: 約{estimated_time:.1f}分 ({estimated_time/60:.1f}時間)")
     print(f"🎲 ランダムに選ばれた最初の10個のapp_id: {app_ids_to_collect[:10]}")
     confirm = input("\n収集を開始しますか？ (y/n): ")
@@ -517,7 +841,7 @@ def main():
     collected_data = collector.collect_bulk(app_ids_to_collect, output_prefix=output_prefix)
     
     # データ保存
-    if collected_data:
+    if not collected_data.empty:
         logger.info("\n💾 データを保存中...")
         
         # JSON保存
@@ -534,7 +858,7 @@ def main():
         # サンプルデータ表示
         print("\n📊 取得データのサンプル（最初の3件）:")
         print("="*70)
-        for game in collected_data[:3]: 
+        for game in collected_data.head(3).to_dict('records'):
             print(json.dumps(game, ensure_ascii=False, indent=2))
             print("-"*70)
         
@@ -1,14 +1,44 @@
+import asyncio
+import aiohttp
+from aiolimiter import AsyncLimiter
 import requests
-import json
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import csv
+import orjson
+import numpy as np
+import os
 import random
+import time
 from datetime import datetime
-import pandas as pd
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+from steam_api_base import SteamAppIdMixin
+
+# API Key（https://steamcommunity.com/dev/apikey で取得し、環境変数 STEAM_API_KEY に設定）
+STEAM_API_KEY = os.environ.get('STEAM_API_KEY', '')
+
+# 収集途中の結果を1行1件で追記するチェックポイント
+CHECKPOINT_FILE = 'steam_simple_checkpoint.jsonl'
+
+# エンドポイント（ゲームごとに毎回組み立てない）
+PLAYER_COUNT_URL = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
+REVIEW_URL_TEMPLATE = "https://store.steampowered.com/appreviews/{}"
+APPDETAILS_URL = "https://store.steampowered.com/api/appdetails"
+REVIEW_PARAMS = {
+    'json': 1,
+    'language': 'all',
+    'purchase_type': 'all',
+    'num_per_page': 0
+}
 
-# API Key（https://steamcommunity.com/dev/apikey で取得）
-STEAM_API_KEY = "942710D8C9D88DF9C28ED5E25B03CFED"
+# レビュー数が取得できなかったゲームの値
+_NULL_REVIEW = {
+    'total_reviews': None,
+    'positive_reviews': None,
+    'negative_reviews': None
+}
 
 # ロギング設定
 logging.basicConfig(
@@ -18,252 +48,272 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class SteamDataCollector:
+class SteamDataCollector(SteamAppIdMixin):
     """Steam APIからapp_id、プレイヤー数、レビュー数を収集"""
     
-    def __init__(self, api_key=None, delay=1.3, timeout=10):
+    def __init__(self, api_key=None, rate_per_sec=3.0, timeout=10, concurrency=16, max_retries=3):
         self.api_key = api_key
-        self.delay = delay
+        self.rate_per_sec = rate_per_sec
+        # トークンバケットで毎秒のリクエスト数を制限（待機中も他のコルーチンは進む）
+        self.limiter = AsyncLimiter(max_rate=rate_per_sec, time_period=1)
         self.timeout = timeout
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.concurrency = concurrency  # 同時に処理するゲーム数の上限
+        self.max_retries = max_retries
+        self._sem = None
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        }
+        # アプリ一覧の取得は同期の requests、ゲームごとの取得は aiohttp で並行実行
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # 接続プールを広げ、429/5xx はアダプタ側で再試行
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        self.aio_session = None
+        # 収集開始時刻（各レコードには開始からの経過秒 t_offset のみ持たせる）
+        self.collection_started_at = None
+        self._t0 = None
     
-    def get_all_app_ids(self) -> List[int]:
-        """全アプリIDを取得"""
-        logger.info("全アプリケーションリストを取得中...")
+    async def _get_json(self, url: str, params: Dict) -> Optional[Dict]:
+        """GETしてJSONを返す（429/5xx は指数バックオフで再試行）"""
+        # ループ内の属性参照を避けるためローカルに束縛
+        limiter = self.limiter
+        get = self.aio_session.get
+        loads = orjson.loads
         
-        if self.api_key:
-            return self._get_app_ids_via_store_service()
-        
-        try:
-            url = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            
-            data = response.json()
-            apps = data['applist']['apps']
-            app_ids = [app['appid'] for app in apps if app.get('appid')]
+        for attempt in range(self.max_retries + 1):
+            async with limiter:
+                async with get(url, params=params) as response:
+                    if response.status == 200:
+                        return loads(await response.read())
+                    if response.status != 429 and response.status < 500:
+                        return None
             
-            logger.info(f"{len(app_ids):,}個のアプリIDを取得")
-            return app_ids
-        except Exception as e:
-            logger.error(f"エラー: {e}")
-            return []
-    
-    def _get_app_ids_via_store_service(self) -> List[int]:
-        """IStoreServiceでアプリID取得"""
-        url = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
-        app_ids = []
-        last_appid = 0
-        has_more = True
+            if attempt < self.max_retries:
+                wait = 2 ** attempt + random.random()
+                logger.warning(f"⚠️ HTTP {response.status}: {wait:.1f}秒後に再試行 ({url})")
+                await asyncio.sleep(wait)
         
-        while has_more:
-            params = {
-                'key': self.api_key,
-                'include_games': 1,
-                'include_dlc': 0,
-                'include_software': 0,
-                'last_appid': last_appid,
-                'max_results': 50000
-            }
-            try:
-                resp = self.session.get(url, params=params, timeout=self.timeout)
-                resp.raise_for_status()
-                data = resp.json()
-                
-                response_body = data.get('response', {})
-                apps = response_body.get('apps', [])
-                
-                if not apps:
-                    break
-                
-                new_ids = [app['appid'] for app in apps]
-                app_ids.extend(new_ids)
-                
-                last_appid = response_body.get('last_appid')
-                has_more = response_body.get('have_more_results', False)
-                
-                logger.info(f"  現在 {len(app_ids)} 件...")
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"エラー: {e}")
-                break
-        
-        if app_ids:
-            logger.info(f"{len(app_ids):,}個のアプリIDを取得")
-        
-        return app_ids
+        return None
     
-    def get_player_count(self, app_id: int) -> Optional[int]:
+    async def _guarded(self, coro_factory):
+        """セマフォで同時実行数を制限してコルーチンを実行"""
+        async with self._sem:
+            return await coro_factory()
+    
+    async def get_player_count(self, app_id: int) -> Optional[int]:
         """現在のプレイヤー数を取得"""
         try:
-            url = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
-            response = self.session.get(
-                url,
-                params={'appid': app_id},
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('response', {}).get('result') == 1:
-                    return data['response']['player_count']
-        except:
-            pass
+            data = await self._get_json(PLAYER_COUNT_URL, {'appid': app_id})
+            if data and data.get('response', {}).get('result') == 1:
+                return data['response']['player_count']
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logger.debug(f"AppID {app_id}: {e}")
         
         return None
     
-    def get_review_count(self, app_id: int) -> Optional[Dict]:
+    async def get_review_count(self, app_id: int) -> Optional[Dict]:
         """レビュー数を取得"""
         try:
-            url = f"https://store.steampowered.com/appreviews/{app_id}"
-            params = {
-                'json': 1,
-                'language': 'all',
-                'purchase_type': 'all',
-                'num_per_page': 0
-            }
+            data = await self._get_json(REVIEW_URL_TEMPLATE.format(app_id), REVIEW_PARAMS)
+            if data is None:
+                return None
             
-            response = self.session.get(url, params=params, timeout=self.timeout)
+            query_summary = data.get('query_summary', {})
             
-            if response.status_code == 200:
-                data = response.json()
-                query_summary = data.get('query_summary', {})
-                
-                return {
-                    'total_reviews': query_summary.get('total_reviews', 0),
-                    'positive_reviews': query_summary.get('total_positive', 0),
-                    'negative_reviews': query_summary.get('total_negative', 0)
-                }
-        except:
-            pass
+            return {
+                'total_reviews': query_summary.get('total_reviews', 0),
+                'positive_reviews': query_summary.get('total_positive', 0),
+                'negative_reviews': query_summary.get('total_negative', 0)
+            }
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logger.debug(f"AppID {app_id}: {e}")
         
         return None
     
-    def is_game(self, app_id: int) -> bool:
+    async def is_game(self, app_id: int) -> bool:
         """ゲームかどうかを確認"""
         try:
-            url = "https://store.steampowered.com/api/appdetails"
-            response = self.session.get(
-                url,
-                params={'appids': app_id},
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get(str(app_id), {}).get('success'):
-                    details = data[str(app_id)]['data']
-                    return details.get('type') == 'game'
-        except:
-            pass
+            data = await self._get_json(APPDETAILS_URL, {'appids': app_id})
+            if data and data.get(str(app_id), {}).get('success'):
+                details = data[str(app_id)]['data']
+                return details.get('type') == 'game'
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logger.debug(f"AppID {app_id}: {e}")
         
         return False
     
-    def collect_single_game(self, app_id: int) -> Optional[Dict]:
-        """1つのゲームのデータを収集"""
+    async def are_games(self, app_ids: List[int]) -> Dict[int, bool]:
+        """
+        複数IDについてゲームかどうかを並行して確認する
         
-        # ゲームかどうか確認
-        if not self.is_game(app_id):
-            return None
-        
-        time.sleep(0.3)
-        
-        # プレイヤー数取得
-        player_count = self.get_player_count(app_id)
-        
-        time.sleep(0.3)
+        appdetails は filters=price_overview 単独のときしか複数ID指定に応えず、それでは type が
+        分からないため、is_game で1件ずつ（セマフォの範囲で同時に）確認する。
+        """
+        flags = await asyncio.gather(*[self._guarded(lambda a=a: self.is_game(a)) for a in app_ids])
+        return dict(zip(app_ids, flags))
+    
+    async def collect_single_game(self, app_id: int) -> Optional[Dict]:
+        """
+        1つのゲームのデータを収集
         
-        # レビュー数取得
-        review_data = self.get_review_count(app_id)
+        ゲームかどうかの確認は呼び出し側で済ませておく
+        （api_key ありなら IStoreService の include_games=1、なしなら are_games）。
+        """
         
-        if review_data is None:
-            review_data = {
-                'total_reviews': None,
-                'positive_reviews': None,
-                'negative_reviews': None
-            }
+        # 2つのエンドポイントは互いに依存しないので同時に問い合わせる
+        player_count, review_data = await asyncio.gather(
+            self.get_player_count(app_id),
+            self.get_review_count(app_id)
+        )
         
         return {
             'app_id': app_id,
             'player_count': player_count,
-            'total_reviews': review_data['total_reviews'],
-            'positive_reviews': review_data['positive_reviews'],
-            'negative_reviews': review_data['negative_reviews'],
-            'collected_at': datetime.now().isoformat()
+            **(review_data or _NULL_REVIEW),
+            't_offset': int(time.monotonic() - self._t0)
         }
     
-    def collect_bulk(self, app_ids: List[int]) -> List[Dict]:
+    def load_checkpoint(self, filename: str) -> Tuple[Dict, List[Dict]]:
+        """JSONLチェックポイントから meta（収集開始時刻・対象ID）と収集済みレコードを読み込む"""
+        if not os.path.exists(filename):
+            return {}, []
+        
+        meta = {}
+        records = []
+        with open(filename, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # 中断時に書きかけになった行は読み飛ばす
+                    logger.warning(f"⚠️ 壊れた行をスキップ: {filename}")
+                    continue
+                if 'meta' in record:
+                    meta = record['meta']
+                else:
+                    records.append(record)
+        return meta, records
+    
+    def collect_bulk(self, app_ids: List[int], checkpoint_file: Optional[str] = None) -> List[Dict]:
         """大量のゲームデータを収集"""
+        return asyncio.run(self.collect_bulk_async(app_ids, checkpoint_file))
+    
+    async def collect_bulk_async(self, app_ids: List[int], checkpoint_file: Optional[str] = None) -> List[Dict]:
+        """
+        大量のゲームデータを並行収集
+        
+        checkpoint_file を指定すると、対象IDを meta に記録し、成功したレコードを1行ずつ追記する。
+        既存のチェックポイントに含まれるIDはスキップし、その内容も結果に含める。
+        """
+        meta, previous = self.load_checkpoint(checkpoint_file) if checkpoint_file else ({}, [])
+        started_at = meta.get('started_at')
+        
+        # 再開時は前回の開始時刻を引き継ぎ、t_offset の基準をそろえる
+        now = datetime.now()
+        started = datetime.fromisoformat(started_at) if started_at else now
+        self.collection_started_at = started.isoformat()
+        self._t0 = time.monotonic() - (now - started).total_seconds()
+        
+        if previous:
+            seen = {r['app_id'] for r in previous}
+            app_ids = [a for a in app_ids if a not in seen]
+            logger.info(f"📂 チェックポイントから再開: 収集済み {len(previous):,}件")
+        
         logger.info(f"🚀 {len(app_ids):,}ゲームのデータ収集を開始")
         
-        all_data = []
+        done = 0
         successful = 0
-        failed = 0
+        # ログは1秒に1回まで（ロック取得と書式化を件数ではなく経過時間に比例させる）
+        log = logger.info
+        last_log = time.monotonic()
         
-        for i, app_id in enumerate(app_ids, 1):
-            if i % 50 == 0:
-                logger.info(f"進捗: {i}/{len(app_ids)} ({i/len(app_ids)*100:.1f}%) | 成功: {successful}")
-            
-            game_data = self.collect_single_game(app_id)
+        async def fetch_game(app_id):
+            nonlocal done, successful, last_log
+            game_data = await self._guarded(lambda: self.collect_single_game(app_id))
+            done += 1
             
             if game_data:
-                all_data.append(game_data)
                 successful += 1
-                
-                if i % 10 == 0:
-                    logger.info(f"✅ [{i}] AppID {app_id}: 収集完了")
-            else:
-                failed += 1
+                if ckpt:
+                    ckpt.write(orjson.dumps(game_data).decode() + '\n')
+            
+            now = time.monotonic()
+            if now - last_log >= 1.0:
+                log(f"進捗: {done}/{len(game_ids)} ({done/len(game_ids)*100:.1f}%) | 成功: {successful}")
+                last_log = now
             
-            # レート制限対策
-            if i < len(app_ids):
-                time.sleep(self.delay)
+            return game_data
         
-        logger.info(f"\n✨ 完了！ 成功: {successful}, 失敗: {failed}")
-        return all_data
+        # 同時接続数はコネクタで制限し、keep-alive で接続を再利用
+        connector = aiohttp.TCPConnector(limit=50, limit_per_host=20)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # 429/500 を避けるため、同時に処理するゲーム数をセマフォで制限
+        self._sem = asyncio.Semaphore(self.concurrency)
+        # 行バッファリングで1件ごとにディスクへ書き出す
+        ckpt = open(checkpoint_file, 'a', buffering=1, encoding='utf-8') if checkpoint_file else None
+        if ckpt and started_at is None:
+            # 再開時に同じサンプルを引き直せるよう、対象IDも一緒に記録する
+            meta = {'started_at': self.collection_started_at, 'app_ids': app_ids}
+            ckpt.write(orjson.dumps({'meta': meta}).decode() + '\n')
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers) as session:
+            self.aio_session = session
+            try:
+                game_ids = app_ids
+                if not self.api_key:
+                    # GetAppList のIDはゲーム以外も含むため、先にまとめて判定して絞り込む
+                    game_flags = await self.are_games(app_ids)
+                    game_ids = [a for a in app_ids if game_flags.get(a)]
+                    logger.info(f"🎮 ゲーム判定: {len(game_ids):,}/{len(app_ids):,}件がゲーム")
+                
+                results = await asyncio.gather(*[fetch_game(a) for a in game_ids])
+            finally:
+                self.aio_session = None
+                if ckpt:
+                    ckpt.close()
+        
+        all_data = [r for r in results if r]
+        failed = len(game_ids) - len(all_data)
+        skipped = len(app_ids) - len(game_ids)  # ゲーム判定で除外した件数（失敗には含めない）
+        
+        logger.info(f"\n✨ 完了！ 成功: {len(all_data)}, 失敗: {failed}, ゲーム以外: {skipped}")
+        return previous + all_data
     
     def save_to_json(self, data: List[Dict], filename: str):
-        """JSONに保存"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """JSONに保存（収集開始時刻は meta に1回だけ記録）"""
+        output = {
+            'meta': {'started_at': self.collection_started_at},
+            'rows': data
+        }
+        # orjson は UTF-8 のバイト列を直接出力する
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
         logger.info(f"💾 JSON保存: {filename} ({len(data):,}件)")
     
     def save_to_csv(self, data: List[Dict], filename: str):
         """CSVに保存"""
-        df = pd.DataFrame(data)
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
+        with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
+            writer.writeheader()
+            writer.writerows(data)
         logger.info(f"💾 CSV保存: {filename} ({len(data):,}件)")
 
 
-def main():
-    """メイン実行"""
-    
-    print("="*70)
-    print("🎮 Steam データ収集ツール（シンプル版）")
-    print("="*70)
-    print("\n取得データ:")
-    print("  - app_id")
-    print("  - player_count（現在のプレイヤー数）")
-    print("  - total_reviews（総レビュー数）")
-    print("  - positive_reviews（好評数）")
-    print("  - negative_reviews（不評数）")
-    print("="*70)
-    
-    # コレクター初期化
-    api_key = STEAM_API_KEY if STEAM_API_KEY else None
-    collector = SteamDataCollector(api_key=api_key, delay=1.3, timeout=10)
-    
-    # 全アプリID取得
+def sample_app_ids(collector) -> List[int]:
+    """全アプリIDを取得し、選んだ件数をランダムサンプリング（取得に失敗したら空のリスト）"""
     all_app_ids = collector.get_all_app_ids()
     
-    if not all_app_ids:
+    if all_app_ids.size == 0:
         logger.error("アプリIDの取得に失敗")
-        return
+        return []
     
-    print(f"\n📊 利用可能なアプリID数: {len(all_app_ids):,}")
+    print(f"\n📊 利用可能なアプリID数: {all_app_ids.size:,}")
     
     # 収集数を選択
     print("\n収集数を選択:")
@@ -289,10 +339,52 @@ def main():
         target_count = 100
     
     # ランダムサンプリング
-    sampled_ids = random.sample(all_app_ids, min(target_count, len(all_app_ids)))
+    rng = np.random.default_rng()
+    return rng.choice(all_app_ids, size=min(target_count, all_app_ids.size), replace=False).tolist()
+
+
+def main():
+    """メイン実行"""
+    
+    print("="*70)
+    print("🎮 Steam データ収集ツール（シンプル版）")
+    print("="*70)
+    print("\n取得データ:")
+    print("  - app_id")
+    print("  - player_count（現在のプレイヤー数）")
+    print("  - total_reviews（総レビュー数）")
+    print("  - positive_reviews（好評数）")
+    print("  - negative_reviews（不評数）")
+    print("="*70)
+    
+    # コレクター初期化
+    api_key = STEAM_API_KEY if STEAM_API_KEY else None
+    collector = SteamDataCollector(api_key=api_key, rate_per_sec=3.0, timeout=10)
+    
+    # キーが無効だと旧APIの低速な経路に黙って切り替わるため、開始前に確認する
+    if not api_key:
+        logger.warning("⚠️ STEAM_API_KEY が未設定です。旧API（ISteamApps）で取得するため、ゲーム判定の分だけ遅くなります")
+    elif not collector.check_api_key():
+        logger.error("❌ STEAM_API_KEY が無効です。環境変数の値を確認してください")
+        return
+    
+    # 前回のチェックポイントがあれば、同じサンプルで続きから収集する
+    meta, previous = collector.load_checkpoint(CHECKPOINT_FILE)
+    sampled_ids = meta.get('app_ids')
+    if sampled_ids:
+        print(f"\n📂 前回のチェックポイントから再開します（{len(sampled_ids):,}ゲーム）")
+    else:
+        sampled_ids = sample_app_ids(collector)
+        if not sampled_ids:
+            return
     
     print(f"\n🎲 {len(sampled_ids):,}個のゲームをランダムサンプリング")
-    print(f"⏱️  推定所要時間: 約{len(sampled_ids) * 2.0 / 60:.1f}分")
+    # ゲームごとにプレイヤー数とレビュー数の2リクエスト。キーなしでは全IDに appdetails の判定が1回加わり、
+    # ゲーム以外はそこで打ち切るため、全件がゲームだった場合の上限として見積もる
+    seen = {r['app_id'] for r in previous}
+    remaining = sum(1 for a in sampled_ids if a not in seen)
+    requests_per_id = 2 if api_key else 3
+    print(f"⏱️  推定所要時間: 最大約{remaining * requests_per_id / collector.rate_per_sec / 60:.1f}分")
     
     confirm = input("\n収集を開始しますか？ (y/n): ")
     
@@ -302,7 +394,8 @@ def main():
     
     # データ収集
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    collected_data = collector.collect_bulk(sampled_ids)
+    # 中断しても CHECKPOINT_FILE から再開できる
+    collected_data = collector.collect_bulk(sampled_ids, checkpoint_file=CHECKPOINT_FILE)
     
     # 保存
     if collected_data:
@@ -311,30 +404,44 @@ def main():
         collector.save_to_json(collected_data, f'{prefix}.json')
         collector.save_to_csv(collected_data, f'{prefix}.csv')
         
+        # 最終ファイルを保存できたのでチェックポイントは不要
+        os.remove(CHECKPOINT_FILE)
+        
         # サマリー表示
         print("\n" + "="*70)
         print("📈 データサマリー")
         print("="*70)
         
         total = len(collected_data)
-        with_players = sum(1 for g in collected_data if g.get('player_count') and g['player_count'] > 0)
-        with_reviews = sum(1 for g in collected_data if g.get('total_reviews') and g['total_reviews'] > 0)
+        
+        # 件数・合計・最大を1回の走査で集計
+        with_players = sum_players = max_players = 0
+        with_reviews = sum_reviews = max_reviews = 0
+        for g in collected_data:
+            pc = g.get('player_count') or 0
+            if pc > 0:
+                with_players += 1
+                sum_players += pc
+                max_players = max(max_players, pc)
+            rc = g.get('total_reviews') or 0
+            if rc > 0:
+                with_reviews += 1
+                sum_reviews += rc
+                max_reviews = max(max_reviews, rc)
         
         print(f"総ゲーム数: {total:,}")
         print(f"プレイヤー数あり: {with_players:,} ({with_players/total*100:.1f}%)")
         print(f"レビューあり: {with_reviews:,} ({with_reviews/total*100:.1f}%)")
         
         if with_players > 0:
-            players = [g['player_count'] for g in collected_data if g.get('player_count') and g['player_count'] > 0]
             print(f"\nプレイヤー数統計:")
-            print(f"  最大: {max(players):,}")
-            print(f"  平均: {sum(players)/len(players):.1f}")
+            print(f"  最大: {max_players:,}")
+            print(f"  平均: {sum_players/with_players:.1f}")
         
         if with_reviews > 0:
-            reviews = [g['total_reviews'] for g in collected_data if g.get('total_reviews') and g['total_reviews'] > 0]
             print(f"\nレビュー数統計:")
-            print(f"  最大: {max(reviews):,}")
-            print(f"  平均: {sum(reviews)/len(reviews):.1f}")
+            print(f"  最大: {max_reviews:,}")
+            print(f"  平均: {sum_reviews/with_reviews:.1f}")
         
         print("="*70)
     else:
@@ -1,15 +1,62 @@
+import asyncio
+import collections
+from array import array
+import aiohttp
+from aiolimiter import AsyncLimiter
 import requests
-import json
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+import glob
 import random
+import time
 import os
 from datetime import datetime
 import pandas as pd
 import logging
 from typing import List, Dict, Optional
 
-# API Key（https://steamcommunity.com/dev/apikey で取得）
-STEAM_API_KEY = "942710D8C9D88DF9C28ED5E25B03CFED"
+import numpy as np
+
+from steam_api_base import SteamAppIdMixin
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_ENGINE = 'xlsxwriter'  # 行を逐次ディスクに書き出す
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# API Key（https://steamcommunity.com/dev/apikey で取得し、環境変数 STEAM_API_KEY に設定）
+STEAM_API_KEY = os.environ.get('STEAM_API_KEY', '')
+
+# チェックポイント書き込みのバッファサイズ
+CHECKPOINT_BUFFER_SIZE = 1 << 20
+
+# appid だけを埋め込めばよいURL（クエリのエンコードを毎回しない）
+PLAYER_COUNT_URL_TEMPLATE = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/?appid={}"
+
+# 429 を受けて送信レートを下げるときの下限（件/分）
+MIN_RATE_PER_MIN = 30
+# 送信レートを変える間隔（秒）。同じ 429 の波で何度も半減させないよう、この間は1回だけ変える
+RATE_ADJUST_INTERVAL = 10
+# 成功が続いたときに設定値まで戻していく幅（件/分）
+RATE_INCREASE_PER_MIN = 10
+
+# ワーカーに渡すIDと、書き込み側に返す結果のキューの上限
+QUEUE_SIZE = 1024
+
+# 直近の速度を求めるときに見るレコード数
+RATE_WINDOW = 500
+
+# 進捗ログの区切り線
+SEPARATOR = '=' * 70
 
 # ロギング設定
 logging.basicConfig(
@@ -23,25 +70,56 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class SteamPlayerCountCollector:
+class SteamPlayerCountCollector(SteamAppIdMixin):
     """Steam APIからプレイヤー数のみを高速収集"""
     
-    def __init__(self, api_key=None, delay=0.3, timeout=10, checkpoint_interval=500):
+    def __init__(self, api_key=None, rate_per_min=200, timeout=10, checkpoint_interval=500, concurrency=64, max_retries=4):
         """
         Args:
-            delay: API呼び出し間隔（秒） - プレイヤー数APIは制限が緩いため短く設定
+            rate_per_min: 1分あたりのリクエスト数の上限 - プレイヤー数APIは制限が緩いため高めに設定
             timeout: リクエストタイムアウト（秒）
             checkpoint_interval: 何件ごとに中間保存するか
+            concurrency: 同時に送るリクエスト数の上限
+            max_retries: 429/5xx・通信エラー時の再試行回数
         """
-        self.delay = delay
+        self.rate_per_min = rate_per_min
+        self.max_rate_per_min = rate_per_min  # 429 で下げた後に戻す上限
+        self._last_rate_change = 0.0  # 最後に送信レートを変えた時刻（monotonic）
         self.api_key = api_key
         self.timeout = timeout
         self.checkpoint_interval = checkpoint_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        # トークンバケットで送信レートを平準化（固定 sleep より詰めて送れる）
+        self.limiter = AsyncLimiter(max_rate=rate_per_min, time_period=60)
         
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # keep-alive 接続を使い回し、429/5xx はアダプタ側で再試行
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET']
+            )
+        )
+        self.session.mount('https://', adapter)
+        # プレイヤー数の取得は aiohttp で並行実行（collect_bulk_async の間だけ有効）
+        self.aio_session = None
+        self._cp_fp = None
+        # 前回のチェックポイント以降に収集できたID（ブロック境界で追記して空にする）
+        self._new_ids_since_ckpt = []
+        # 取得時刻はブロック単位で1回だけ取る（UNIX秒）
+        self._batch_ts = int(time.time())
+        # サンプリングに使った乱数シード（再開時に同じサンプルを再現するため状態ファイルに残す）
+        self.seed = None
+        # サンプリング元の全アプリID（uint32 配列）
+        self._all_ids_np = None
         
         # 統計情報
         self.stats = {
@@ -53,242 +131,343 @@ class SteamPlayerCountCollector:
             'end_time': None
         }
     
-    def get_all_app_ids(self) -> List[int]:
-        """Steam上の全アプリケーションIDを取得"""
-        logger.info("📥 全アプリケーションリストを取得中...")
-        
-        # APIキーがある場合は新しいIStoreServiceを使用
-        if self.api_key:
-            return self._get_app_ids_via_store_service()
-            
-        # 従来のAPIを試行
-        try:
-            logger.info("ℹ️ APIキー未指定: 旧API(ISteamApps)を試行します...")
-            url = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-            
-            response = self.session.get(url, headers=headers, timeout=self.timeout)
-            response.raise_for_status()
-            
-            data = response.json()
-            apps = data['applist']['apps']
-            app_ids = [app['appid'] for app in apps if app.get('appid')]
-            
-            logger.info(f"✅ {len(app_ids):,}個のアプリケーションIDを取得しました")
-            return app_ids
-            
-        except Exception as e:
-            logger.error(f"❌ 旧API取得エラー: {e}")
-            return []
-
-    def _get_app_ids_via_store_service(self) -> List[int]:
-        """IStoreService (v1) を使用してアプリIDを取得（APIキー必須）"""
-        url = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
-        app_ids = []
-        last_appid = 0
-        has_more = True
-        
-        logger.info("📥 IStoreService(v1)経由でリスト取得中...")
-        
-        while has_more:
-            params = {
-                'key': self.api_key,
-                'include_games': 1,
-                'include_dlc': 0,
-                'include_software': 0,
-                'last_appid': last_appid,
-                'max_results': 50000
-            }
-            try:
-                resp = self.session.get(url, params=params, timeout=self.timeout)
-                resp.raise_for_status()
-                data = resp.json()
-                
-                response_body = data.get('response', {})
-                apps = response_body.get('apps', [])
-                
-                if not apps:
-                    break
-                
-                new_ids = [app['appid'] for app in apps]
-                app_ids.extend(new_ids)
-                
-                last_appid = response_body.get('last_appid')
-                has_more = response_body.get('have_more_results', False)
-                
-                logger.info(f"  - 現在 {len(app_ids)} 件...")
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"❌ IStoreServiceエラー: {e}")
-                break
-        
-        if app_ids:
-            logger.info(f"✅ {len(app_ids):,}個のアプリケーションIDを取得しました")
-        
-        return app_ids
-
-    def random_sample_app_ids(self, all_app_ids: List[int], sample_size: int, seed=None) -> List[int]:
+    def random_sample_app_ids(self, all_app_ids: np.ndarray, sample_size: int, seed=None) -> List[int]:
         """
         ランダムにapp_idをサンプリング
         
         Args:
-            all_app_ids: 全アプリIDのリスト
+            all_app_ids: 全アプリIDの配列
             sample_size: サンプル数
             seed: 乱数シード（再現性が必要な場合に指定）
         """
+        self.seed = seed
         if seed is not None:
-            random.seed(seed)
             logger.info(f"🎲 乱数シード: {seed}（結果の再現が可能）")
         
-        actual_sample_size = min(sample_size, len(all_app_ids))
-        sampled_ids = random.sample(all_app_ids, actual_sample_size)
+        # Python の int リストを作らず、uint32 配列のまま非復元抽出する
+        # 一覧の並び順は取得経路によって変わるため、ソートしてから抽出して同じシードなら同じ結果にする
+        self._all_ids_np = np.sort(np.asarray(all_app_ids, dtype=np.uint32))
+        rng = np.random.default_rng(seed)
+        actual_sample_size = min(sample_size, len(self._all_ids_np))
+        sampled_ids = rng.choice(self._all_ids_np, size=actual_sample_size, replace=False)
         
-        logger.info(f"🎯 {len(all_app_ids):,}個から{actual_sample_size:,}個をランダムサンプリングしました")
-        logger.info(f"📊 サンプルID範囲: {min(sampled_ids)} 〜 {max(sampled_ids)}")
+        logger.info(f"🎯 {len(self._all_ids_np):,}個から{actual_sample_size:,}個をランダムサンプリングしました")
+        logger.info(f"📊 サンプルID範囲: {sampled_ids.min()} 〜 {sampled_ids.max()}")
         
-        return sampled_ids
+        # 収集ループは1件ずつ Python で扱うため、ここでリストに変換する
+        return sampled_ids.tolist()
+    
+    def _set_rate(self, new_rate: float):
+        """同じリミッターのまま送信レートだけを変える（待機中のタスクも新しいレートで流れる）
+        
+        AsyncLimiter を作り直すと空のバケットから new_rate 件を一気に送ってしまい、
+        古いリミッターで待っているタスクも元の速さで流れ続けるため、同じインスタンスを使い続ける。
+        """
+        limiter = self.limiter
+        limiter._leak()  # ここまでの経過分は変更前のレートで減らしておく
+        # 上げたときは空き容量を増やさず、下げたときは溢れた分を切り捨てて、どちらも一気に送らない
+        limiter._level = min(limiter._level + max(new_rate - limiter.max_rate, 0), new_rate)
+        limiter.max_rate = new_rate
+        limiter._rate_per_sec = new_rate / limiter.time_period
+        limiter._wake_next()  # 待機中のタスクの起床時刻を新しいレートで計算し直す
+        self.rate_per_min = new_rate
+        self._last_rate_change = time.monotonic()
+    
+    def _slow_down(self):
+        """429 を受けたら送信レートを半分に下げる（RATE_ADJUST_INTERVAL 秒に1回まで）"""
+        if time.monotonic() - self._last_rate_change < RATE_ADJUST_INTERVAL:
+            return
+        new_rate = max(self.rate_per_min / 2, MIN_RATE_PER_MIN)
+        if new_rate < self.rate_per_min:
+            self._set_rate(new_rate)
+            logger.warning(f"⚠️ 429 を受信: 送信レートを {new_rate:.0f}件/分 に下げます")
     
-    def get_player_count(self, app_id: int) -> Optional[Dict]:
+    def _speed_up(self):
+        """成功が続いていれば、設定した送信レートまで少しずつ戻す（RATE_ADJUST_INTERVAL 秒に1回まで）"""
+        if self.rate_per_min >= self.max_rate_per_min or time.monotonic() - self._last_rate_change < RATE_ADJUST_INTERVAL:
+            return
+        new_rate = min(self.rate_per_min + RATE_INCREASE_PER_MIN, self.max_rate_per_min)
+        self._set_rate(new_rate)
+        logger.info(f"📈 送信レートを {new_rate:.0f}件/分 に戻します")
+    
+    async def _get_json(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """GETしてJSONを返す（429/5xx・通信エラーは指数バックオフで再試行）"""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self.limiter:
+                    async with self.aio_session.get(url, params=params) as response:
+                        if response.status == 200:
+                            self._speed_up()
+                            return orjson.loads(await response.read())
+                        if response.status != 429 and response.status < 500:
+                            return None
+                        if response.status == 429:
+                            self._slow_down()
+                            retry_after = response.headers.get('Retry-After')
+                        reason = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = type(e).__name__
+            
+            if attempt < self.max_retries:
+                # Retry-After（秒）があれば従い、なければ 1, 2, 4, ... 秒（最大30秒）
+                if retry_after and retry_after.isdigit():
+                    wait = int(retry_after)
+                else:
+                    wait = min(2 ** attempt, 30)
+                logger.debug(f"{reason}: {wait}秒後に再試行 ({url})")
+                await asyncio.sleep(wait)
+        
+        return None
+    
+    async def get_player_count(self, app_id: int) -> Optional[Dict]:
         """現在のプレイヤー数を取得"""
         try:
-            url = "https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
-            response = self.session.get(
-                url,
-                params={'appid': app_id},
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('response', {}).get('result') == 1:
-                    player_count = data['response']['player_count']
-                    return {
-                        'app_id': app_id,
-                        'player_count': player_count,
-                        'collected_at': datetime.now().isoformat()
-                    }
-        except:
+            data = await self._get_json(PLAYER_COUNT_URL_TEMPLATE.format(app_id))
+            if data and data.get('response', {}).get('result') == 1:
+                player_count = data['response']['player_count']
+                return {
+                    'app_id': app_id,
+                    'player_count': player_count,
+                    'collected_at_ts': self._batch_ts
+                }
+        except Exception:
             pass
         
         return None
     
-    def collect_bulk(self, app_ids: List[int], output_prefix='steam_players', resume=False) -> List[Dict]:
+    def collect_bulk(self, app_ids: List[int], output_prefix='steam_players', resume=False) -> pd.DataFrame:
+        """大量のプレイヤー数データを高速収集（collect_bulk_async の同期版）"""
+        return asyncio.run(self.collect_bulk_async(app_ids, output_prefix, resume))
+    
+    async def collect_bulk_async(self, app_ids: List[int], output_prefix='steam_players', resume=False) -> pd.DataFrame:
         """
-        大量のプレイヤー数データを高速収集
+        大量のプレイヤー数データを並行収集
+        
+        concurrency 個のワーカーが上限付きキューから app_id を受け取って取得し、
+        結果はこのコルーチンだけが完了順に処理してチェックポイントに追記する。
+        checkpoint_interval 件ごとに中間保存するため、中断しても再開できる。
+        結果は列ごとの numpy 配列に溜め、app_id / player_count / collected_at_ts の
+        DataFrame として返す。
         
         Args:
             app_ids: 収集するapp_idのリスト
             output_prefix: 出力ファイルのプレフィックス
             resume: Trueの場合、既存のチェックポイントから再開
         """
-        all_data = []
+        restored = []
         processed_ids = set()
-        start_index = 0
+        checkpoint_file = f'{output_prefix}_checkpoint.jsonl'
+        state_file = f'{output_prefix}_state.json'
+        ids_file = f'{output_prefix}_processed_ids.bin'
         
-        # 再開モード: 既存のチェックポイントを探す
+        # 再開モード: JSONLチェックポイントの各行から収集済みデータを復元
         if resume:
-            checkpoint_loaded = False
-            # チェックポイントファイルを降順で探す
-            for i in range(len(app_ids), 0, -self.checkpoint_interval):
-                checkpoint_file = f'{output_prefix}_checkpoint_{i}.json'
-                if os.path.exists(checkpoint_file):
-                    logger.info(f"🔄 チェックポイント発見: {checkpoint_file}")
-                    try:
-                        with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                            all_data = json.load(f)
-                        processed_ids = {game['app_id'] for game in all_data}
-                        start_index = i
-                        checkpoint_loaded = True
-                        logger.info(f"✅ {len(all_data)}件のデータを復元しました")
-                        logger.info(f"📍 {start_index}番目から再開します")
-                        break
-                    except Exception as e:
-                        logger.warning(f"⚠️ チェックポイント読み込みエラー: {e}")
-            
-            if not checkpoint_loaded:
+            if os.path.exists(checkpoint_file):
+                logger.info(f"🔄 チェックポイント発見: {checkpoint_file}")
+                with open(checkpoint_file, 'rb') as f:
+                    for line in f:
+                        try:
+                            restored.append(orjson.loads(line))
+                        except orjson.JSONDecodeError:
+                            # 中断時に書きかけになった行は読み飛ばす
+                            logger.warning("⚠️ 壊れた行をスキップしました")
+                processed_ids = {game['app_id'] for game in restored}
+                processed_ids.update(self._load_processed_ids(ids_file))
+                logger.info(f"✅ {len(restored)}件のデータを復元しました")
+            else:
                 logger.info("ℹ️ チェックポイントが見つかりませんでした。最初から開始します")
         
+        # 収集済みのIDは最初に1回だけ除外し、以降のループではスキップ判定をしない
+        remaining = [app_id for app_id in app_ids if app_id not in processed_ids]
+        done_offset = len(app_ids) - len(remaining)
+        
+        # レコードを dict で持たず、列ごとの配列に詰める（1件16バイト）
+        capacity = len(restored) + len(remaining)
+        app_id_arr = np.empty(capacity, dtype=np.uint32)
+        player_count_arr = np.empty(capacity, dtype=np.int32)
+        ts_arr = np.empty(capacity, dtype=np.int64)
+        n = len(restored)
+        app_id_arr[:n] = [game['app_id'] for game in restored]
+        player_count_arr[:n] = [game['player_count'] for game in restored]
+        ts_arr[:n] = [game['collected_at_ts'] for game in restored]
+        del restored
+        
         self.stats['total_requested'] = len(app_ids)
-        self.stats['successful'] = len(all_data)
+        self.stats['successful'] = n
         self.stats['start_time'] = datetime.now()
         
         logger.info("="*70)
         logger.info(f"🚀 {len(app_ids):,}ゲームのプレイヤー数データ収集を開始します")
-        if resume and start_index > 0:
-            logger.info(f"🔄 再開モード: {start_index}/{len(app_ids)}から継続")
-        logger.info(f"⏱️  推定所要時間: {len(app_ids) * self.delay / 60:.1f}分 ({len(app_ids) * self.delay / 3600:.1f}時間)")
-        logger.info(f"⚡ 高速モード: 1ゲームあたり約{self.delay:.1f}秒（プレイヤー数のみ）")
+        if resume and processed_ids:
+            logger.info(f"🔄 再開モード: {len(processed_ids):,}件を収集済みとしてスキップ")
+        logger.info(f"⏱️  推定所要時間: {len(remaining) / self.rate_per_min:.1f}分 ({len(remaining) / self.rate_per_min / 60:.1f}時間)")
+        logger.info(f"⚡ 高速モード: 毎分{self.rate_per_min:.0f}件まで（プレイヤー数のみ）")
         logger.info("="*70)
         
-        for i, app_id in enumerate(app_ids, 1):
-            # スキップ済みのIDはスキップ
-            if app_id in processed_ids:
-                continue
-            
-            # 進捗表示
-            if i % 100 == 0 or i == 1:
-                elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
-                speed = i / elapsed if elapsed > 0 else 0
-                remaining = (len(app_ids) - i) / speed if speed > 0 else 0
-                
-                logger.info(f"\n{'='*70}")
-                logger.info(f"進捗: {i:,}/{len(app_ids):,} ({i/len(app_ids)*100:.1f}%)")
-                logger.info(f"成功: {self.stats['successful']:,} | 失敗: {self.stats['failed']:,}")
-                logger.info(f"プレイヤーあり: {self.stats['with_players']:,} ({self.stats['with_players']/max(self.stats['successful'], 1)*100:.1f}%)")
-                logger.info(f"速度: {speed:.2f}ゲーム/秒")
-                logger.info(f"残り時間: 約{remaining/60:.1f}分")
-                logger.info(f"{'='*70}")
-            
-            # データ収集
-            player_data = self.get_player_count(app_id)
-            
-            if player_data:
-                all_data.append(player_data)
-                processed_ids.add(app_id)
-                self.stats['successful'] += 1
-                
-                if player_data['player_count'] > 0:
-                    self.stats['with_players'] += 1
-                
-                if i % 50 == 0:
-                    logger.info(f"✅ [{i}] AppID {app_id}: プレイヤー数 {player_data['player_count']:,}")
-            else:
-                self.stats['failed'] += 1
-                logger.debug(f"⚠️ [{i}] AppID {app_id}: 取得失敗")
-            
-            # チェックポイント保存
-            if i % self.checkpoint_interval == 0:
-                checkpoint_file = f'{output_prefix}_checkpoint_{i}.json'
-                self._save_checkpoint(all_data, checkpoint_file)
-                self._save_processed_ids(processed_ids, f'{output_prefix}_processed_ids.json')
-                logger.info(f"💾 チェックポイント保存: {checkpoint_file}")
-            
-            # レート制限対策
-            if i < len(app_ids):
-                time.sleep(self.delay)
-        
+        # ID を流すキューと結果を返すキューはどちらも上限付きにし、件数に関係なくメモリを一定に保つ
+        id_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        result_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        
+        async def producer():
+            for app_id in remaining:
+                await id_queue.put(app_id)
+            for _ in range(self.concurrency):
+                await id_queue.put(None)  # ワーカー終了の合図
+        
+        async def worker():
+            while True:
+                app_id = await id_queue.get()
+                if app_id is None:
+                    return
+                await result_queue.put((app_id, await self.get_player_count(app_id)))
+        
+        # 同時接続数はコネクタとワーカー数で制限し、keep-alive で接続を再利用
+        connector = aiohttp.TCPConnector(limit=256, limit_per_host=64)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        total = len(remaining)
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        # 経過時間は monotonic で測り、直近 RATE_WINDOW 件の完了時刻から現在の速度を求める
+        self._t0 = time.monotonic()
+        self._window = collections.deque(maxlen=RATE_WINDOW)
+        self._batch_ts = int(time.time())
+        
+        # 成功したレコードを1行ずつ追記（全件の書き直しをしない）
+        # 1 MiB のバッファに溜め、チェックポイントごとにまとめて書き出してシステムコールを減らす
+        self._cp_fp = open(checkpoint_file, 'ab', buffering=CHECKPOINT_BUFFER_SIZE)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=dict(self.session.headers)) as session:
+            self.aio_session = session
+            # 取得は concurrency 個のワーカーが並行で行い、結果の処理と書き込みはこのコルーチンだけが行う
+            fetchers = [asyncio.create_task(producer())]
+            fetchers += [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            try:
+                for i in range(1, total + 1):
+                    app_id, player_data = await result_queue.get()
+                    now = time.monotonic()
+                    self._window.append(now)
+                    
+                    # 進捗表示
+                    if i % 100 == 0 or i == 1:
+                        elapsed = now - self._t0
+                        speed = i / elapsed if elapsed > 0 else 0
+                        # 全体平均は停滞の影響が残るため、残り時間は直近の速度で見積もる
+                        span = self._window[-1] - self._window[0]
+                        recent_speed = (len(self._window) - 1) / span if span > 0 else speed
+                        eta = (total - i) / recent_speed if recent_speed > 0 else 0
+                        successful = self.stats['successful']
+                        with_players = self.stats['with_players']
+                        
+                        # 文字列の組み立ては logging に任せる（%形式の遅延フォーマット）
+                        logger.info("\n%s", SEPARATOR)
+                        logger.info("進捗: %d/%d (%.1f%%)", i, total, i / total * 100)
+                        logger.info("成功: %d | 失敗: %d", successful, self.stats['failed'])
+                        logger.info("プレイヤーあり: %d (%.1f%%)", with_players, with_players / successful * 100 if successful else 0.0)
+                        logger.info("速度: %.2fゲーム/秒（直近 %.2fゲーム/秒）", speed, recent_speed)
+                        logger.info("残り時間: 約%.1f分", eta / 60)
+                        logger.info("%s", SEPARATOR)
+                    
+                    if player_data:
+                        app_id_arr[n] = app_id
+                        player_count_arr[n] = player_data['player_count']
+                        ts_arr[n] = player_data['collected_at_ts']
+                        n += 1
+                        self._new_ids_since_ckpt.append(app_id)
+                        # 改行も orjson に付けさせ、連結用のバイト列を作らない
+                        self._cp_fp.write(orjson.dumps(player_data, option=orjson.OPT_APPEND_NEWLINE))
+                        self.stats['successful'] += 1
+                        
+                        if player_data['player_count'] > 0:
+                            self.stats['with_players'] += 1
+                        
+                        if i % 50 == 0:
+                            logger.info("✅ [%d] AppID %d: プレイヤー数 %d", i, app_id, player_data['player_count'])
+                    else:
+                        self.stats['failed'] += 1
+                        if debug_enabled:
+                            logger.debug("⚠️ [%d] AppID %d: 取得失敗", i, app_id)
+                    
+                    # checkpoint_interval 件ごとにチェックポイントをディスクに確定
+                    if i % self.checkpoint_interval == 0 or i == total:
+                        self._flush_checkpoint()
+                        self._append_processed_ids(ids_file)
+                        self._save_state(state_file, 'collecting', done_offset + i, len(app_ids), n)
+                        logger.info(f"💾 チェックポイント保存: {checkpoint_file} ({n:,}件)")
+                        self._batch_ts = int(time.time())
+            finally:
+                # 中断時は取得中のワーカーを止めてからセッションを閉じる
+                for task in fetchers:
+                    task.cancel()
+                await asyncio.gather(*fetchers, return_exceptions=True)
+                self.aio_session = None
+                self._cp_fp.close()
+                self._cp_fp = None
+        
+        self._save_state(state_file, 'done', len(app_ids), len(app_ids), n)
         self.stats['end_time'] = datetime.now()
         self._print_final_stats()
         
-        return all_data
+        return pd.DataFrame({
+            'app_id': app_id_arr[:n],
+            'player_count': player_count_arr[:n],
+            'collected_at_ts': ts_arr[:n]
+        })
     
-    def _save_checkpoint(self, data: List[Dict], filename: str):
-        """中間保存"""
+    def _flush_checkpoint(self):
+        """追記済みのチェックポイントをディスクに書き出す"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
+            self._cp_fp.flush()
+            os.fsync(self._cp_fp.fileno())
+        except OSError as e:
             logger.error(f"チェックポイント保存エラー: {e}")
     
-    def _save_processed_ids(self, processed_ids: set, filename: str):
-        """処理済みIDリストを保存"""
+    def _append_processed_ids(self, filename: str):
+        """前回のチェックポイント以降に処理したIDだけを uint32 のバイナリで追記"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(list(processed_ids), f, ensure_ascii=False, indent=2)
-        except Exception as e:
+            with open(filename, 'ab') as f:
+                array('I', self._new_ids_since_ckpt).tofile(f)
+            self._new_ids_since_ckpt.clear()
+        except OSError as e:
             logger.error(f"処理済みIDリスト保存エラー: {e}")
     
+    def _load_processed_ids(self, filename: str) -> array:
+        """追記された処理済みIDを読み込む（書きかけの末尾は読み飛ばす）"""
+        ids = array('I')
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                ids.fromfile(f, os.path.getsize(filename) // ids.itemsize)
+        return ids
+    
+    def save_sample_ids(self, filename: str, app_ids: List[int]):
+        """サンプリングしたIDを uint32 のバイナリで保存（再開時に同じサンプルを使うため）"""
+        try:
+            with open(filename, 'wb') as f:
+                array('I', app_ids).tofile(f)
+        except OSError as e:
+            logger.error(f"サンプルID保存エラー: {e}")
+    
+    def load_sample_ids(self, filename: str) -> List[int]:
+        """save_sample_ids で保存したIDを読み込む（ファイルがなければ空のリスト）"""
+        return self._load_processed_ids(filename).tolist()
+    
+    def _save_state(self, filename: str, stage: str, last_index: int, target_count: int, collected: int):
+        """再開に必要な収集パラメータを保存（書きかけを残さないよう一時ファイル経由で置き換える）"""
+        state = {
+            'stage': stage,
+            'last_index': last_index,
+            'target_count': target_count,
+            'collected': collected,
+            'seed': self.seed,
+            'timestamp': int(time.time())
+        }
+        try:
+            tmp_file = f'{filename}.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(state))
+            os.replace(tmp_file, filename)
+        except OSError as e:
+            logger.error(f"状態ファイル保存エラー: {e}")
+    
     def _print_final_stats(self):
         """最終統計を表示"""
         duration = (self.stats['end_time'] - self.stats['start_time']).total_seconds()
@@ -305,52 +484,77 @@ class SteamPlayerCountCollector:
         logger.info(f"平均速度:            {self.stats['successful']/duration:.2f}ゲーム/秒")
         logger.info("="*70)
     
-    def save_to_json(self, data: List[Dict], filename: str):
+    def save_to_json(self, data: pd.DataFrame, filename: str):
         """JSONファイルに保存"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # orjson は UTF-8 のバイト列を直接出力する
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data.to_dict('records'), option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
         logger.info(f"💾 JSON保存完了: {filename} ({len(data):,}件)")
     
-    def save_to_csv(self, data: List[Dict], filename: str):
-        """CSVファイルに保存"""
-        if data:
-            df = pd.DataFrame(data)
-            
-            # カラムの順序を指定
-            column_order = ['app_id', 'player_count', 'collected_at']
-            existing_columns = [col for col in column_order if col in df.columns]
-            df = df[existing_columns]
-            
-            # プレイヤー数で降順ソート
-            df = df.sort_values('player_count', ascending=False)
+    def _with_iso_timestamps(self, df: pd.DataFrame) -> pd.DataFrame:
+        """collected_at_ts（UNIX秒）をローカル時刻のISO文字列 collected_at に一括変換"""
+        if 'collected_at_ts' in df.columns:
+            utc_offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+            # 元の DataFrame（Parquet 保存用）は変更しない
+            return df.assign(collected_at=pd.to_datetime(df['collected_at_ts'] + utc_offset, unit='s').dt.strftime('%Y-%m-%dT%H:%M:%S'))
+        return df
+    
+    def _to_sorted_df(self, data: pd.DataFrame) -> pd.DataFrame:
+        """保存用の DataFrame をプレイヤー数の降順で1回だけ作る（CSV/Excel で共有）"""
+        df = self._with_iso_timestamps(data)
+        
+        # カラムの順序を指定
+        column_order = ['app_id', 'player_count', 'collected_at']
+        existing_columns = [col for col in column_order if col in df.columns]
+        
+        # プレイヤー数で降順ソート（安定ソートで同数のゲームは収集順を保つ）
+        return df[existing_columns].sort_values('player_count', ascending=False, kind='mergesort')
+    
+    def save_to_csv(self, data: pd.DataFrame, filename: str, df: Optional[pd.DataFrame] = None):
+        """CSVファイルに保存（df を渡せば作り直さずに使う）"""
+        if len(data):
+            if df is None:
+                df = self._to_sorted_df(data)
             
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
+            # 行をチャンク単位で書き出し、全体を1つの文字列にしない
+            df.to_csv(filename, index=False, encoding='utf-8-sig', chunksize=65536)
             logger.info(f"💾 CSV保存完了: {filename} ({len(data):,}件)")
     
-    def save_to_excel(self, data: List[Dict], filename: str):
-        """Excelファイルに保存"""
-        if data:
-            df = pd.DataFrame(data)
+    def save_to_excel(self, data: pd.DataFrame, filename: str, df: Optional[pd.DataFrame] = None):
+        """Excelファイルに保存（df を渡せば作り直さずに使う）"""
+        if len(data):
+            if df is None:
+                df = self._to_sorted_df(data)
             
-            column_order = ['app_id', 'player_count', 'collected_at']
-            existing_columns = [col for col in column_order if col in df.columns]
-            df = df[existing_columns]
-            
-            # プレイヤー数で降順ソート
-            df = df.sort_values('player_count', ascending=False)
-            
-            df.to_excel(filename, index=False, engine='openpyxl')
+            if EXCEL_ENGINE == 'xlsxwriter':
+                # constant_memory: ワークブック全体をメモリに持たず、1行ずつ書き出す
+                df.to_excel(filename, index=False, engine='xlsxwriter',
+                            engine_kwargs={'options': {'constant_memory': True}})
+            else:
+                df.to_excel(filename, index=False, engine='openpyxl')
             logger.info(f"💾 Excel保存完了: {filename} ({len(data):,}件)")
+    
+    def save_to_parquet(self, data: pd.DataFrame, filename: str):
+        """Parquetファイルに保存（列指向・zstd圧縮。pyarrow がない場合はスキップ）"""
+        if not HAS_PYARROW:
+            logger.info("ℹ️ pyarrow が見つからないため Parquet 保存をスキップします")
+            return
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        pq.write_table(table, filename, compression='zstd')
+        logger.info(f"💾 Parquet保存完了: {filename} ({len(data):,}件)")
 
 
-def print_data_summary(data: List[Dict]):
+def print_data_summary(df: pd.DataFrame):
     """収集データの簡易分析"""
     print("\n" + "="*70)
     print("📈 プレイヤー数データ分析サマリー")
     print("="*70)
     
-    total = len(data)
-    with_players = sum(1 for g in data if g.get('player_count', 0) > 0)
+    # 集計は numpy 配列上でまとめて行う
+    player_counts = df['player_count'].to_numpy()
+    total = len(player_counts)
+    nonzero = player_counts[player_counts > 0]
+    with_players = len(nonzero)
     zero_players = total - with_players
     
     print(f"総ゲーム数:            {total:,}")
@@ -358,19 +562,18 @@ def print_data_summary(data: List[Dict]):
     print(f"プレイヤー0人:         {zero_players:,} ({zero_players/total*100:.1f}%)")
     
     # プレイヤー数統計
-    player_counts = [g['player_count'] for g in data if g.get('player_count', 0) > 0]
-    if player_counts:
+    if with_players:
         print(f"\nプレイヤー数統計（0人除く）:")
-        print(f"  総プレイヤー数:  {sum(player_counts):,}")
-        print(f"  平均:            {sum(player_counts)/len(player_counts):,.1f}")
-        print(f"  最大:            {max(player_counts):,}")
-        print(f"  最小:            {min(player_counts):,}")
+        print(f"  総プレイヤー数:  {int(nonzero.sum()):,}")
+        print(f"  平均:            {nonzero.mean():,.1f}")
+        print(f"  最大:            {int(nonzero.max()):,}")
+        print(f"  最小:            {int(nonzero.min()):,}")
         
-        # TOP 10
-        sorted_data = sorted(data, key=lambda x: x.get('player_count', 0), reverse=True)
+        # TOP 10（全件ソートせず上位だけ取り出す）
+        top10 = df.nlargest(10, 'player_count')
         print(f"\nTOP 10 プレイヤー数:")
-        for i, game in enumerate(sorted_data[:10], 1):
-            print(f"  {i}. AppID {game['app_id']}: {game['player_count']:,}人")
+        for i, (app_id, player_count) in enumerate(zip(top10['app_id'], top10['player_count']), 1):
+            print(f"  {i}. AppID {app_id}: {player_count:,}人")
     
     print("="*70)
 
@@ -390,7 +593,7 @@ def main():
     
     # 再開モードの確認
     resume_mode = False
-    checkpoint_files = [f for f in os.listdir('.') if f.startswith('steam_players_') and '_checkpoint_' in f and f.endswith('.json')]
+    checkpoint_files = glob.glob('steam_players_*_checkpoint.jsonl')
     
     if checkpoint_files:
         print(f"\n💾 {len(checkpoint_files)}個のチェックポイントファイルが見つかりました")
@@ -404,7 +607,7 @@ def main():
     api_key_to_use = STEAM_API_KEY if STEAM_API_KEY else None
     collector = SteamPlayerCountCollector(
         api_key=api_key_to_use,
-        delay=0.3,  # 高速化: プレイヤー数APIは制限が緩い
+        rate_per_min=200,  # 高速化: プレイヤー数APIは制限が緩い（0.3秒/件相当）
         timeout=10,
         checkpoint_interval=500  # 500件ごとに保存
     )
@@ -412,7 +615,7 @@ def main():
     # 全アプリIDを取得
     all_app_ids = collector.get_all_app_ids()
     
-    if not all_app_ids:
+    if all_app_ids.size == 0:
         logger.error("アプリIDの取得に失敗しました")
         return
     
@@ -424,23 +627,32 @@ def main():
     app_ids_to_collect = []
     
     if resume_mode:
-        # 最新のチェックポイントから設定を復元
-        latest_checkpoint = sorted(checkpoint_files, reverse=True)[0]
-        parts = latest_checkpoint.split('_')
-        if len(parts) >= 4:
-            target_count = int(parts[2])
-            timestamp_str = f"{parts[3]}_{parts[4]}"
-            output_prefix = f"steam_players_{target_count}_{timestamp_str}"
-            
-            # 既存のapp_idリストがあれば読み込む
-            processed_ids_file = f'{output_prefix}_processed_ids.json'
-            if os.path.exists(processed_ids_file):
-                with open(processed_ids_file, 'r', encoding='utf-8') as f:
-                    processed_ids = set(json.load(f))
-                    print(f"📋 {len(processed_ids)}個のapp_idがすでに処理済みです")
+        # 最後に更新されたチェックポイントと、その状態ファイルから設定を復元
+        latest_checkpoint = max(checkpoint_files, key=os.path.getmtime)
+        state_file = latest_checkpoint[:-len('_checkpoint.jsonl')] + '_state.json'
+        if os.path.exists(state_file):
+            with open(state_file, 'rb') as f:
+                state = orjson.loads(f.read())
+            target_count = state['target_count']
+            # サンプルをファイルから読んだ場合も、状態ファイルの書き戻しでシードが消えないよう引き継ぐ
+            collector.seed = state['seed']
+            output_prefix = latest_checkpoint[:-len('_checkpoint.jsonl')]
+            print(f"📋 {state['collected']:,}件を収集済み（{state['last_index']:,}/{target_count:,}件まで処理）")
             
             print(f"✅ 前回の設定を復元: {target_count}ゲーム")
-            app_ids_to_collect = collector.random_sample_app_ids(all_app_ids, target_count, seed=None)
+            # 前回のサンプルがあればそのまま使う（アプリ一覧は実行のたびに変わるため、シードだけでは再現できない）
+            app_ids_to_collect = collector.load_sample_ids(f'{output_prefix}_sample.bin')
+            if not app_ids_to_collect:
+                if state['seed'] is None:
+                    logger.warning("⚠️ 乱数シードが記録されていないため、前回と異なるサンプルになります")
+                else:
+                    logger.warning("⚠️ サンプルIDのファイルがないため、シードから引き直します（アプリ一覧が変わっていれば前回と異なるサンプルになります）")
+                if target_count < len(all_app_ids):
+                    app_ids_to_collect = collector.random_sample_app_ids(all_app_ids, target_count, seed=state['seed'])
+                else:
+                    app_ids_to_collect = all_app_ids.tolist()
+        else:
+            logger.warning(f"⚠️ 状態ファイルが見つかりません: {state_file}（新規開始します）")
     
     if not resume_mode or not output_prefix:
         # 新規開始
@@ -477,16 +689,20 @@ def main():
         seed = None
         if use_seed:
             seed = int(input("シード値を入力（整数）: "))
+        else:
+            # 中断後の再開で同じサンプルを再現できるよう、未指定でもシードを決めて記録する
+            seed = random.randrange(2**32)
         
         # ランダムサンプリング
         if target_count < len(all_app_ids):
             app_ids_to_collect = collector.random_sample_app_ids(all_app_ids, target_count, seed=seed)
         else:
-            app_ids_to_collect = all_app_ids
+            app_ids_to_collect = all_app_ids.tolist()
             logger.info(f"✅ 全{len(all_app_ids):,}ゲームを収集します")
         
         # 出力ファイル名を生成
         output_prefix = f'steam_players_{len(app_ids_to_collect)}_{timestamp}'
+        collector.save_sample_ids(f'{output_prefix}_sample.bin', app_ids_to_collect)
     
     # 確認
     estimated_time = len(app_ids_to_collect) * 0.3 / 60
@@ -505,26 +721,29 @@ def main():
     collected_data = collector.collect_bulk(app_ids_to_collect, output_prefix=output_prefix, resume=resume_mode)
     
     # データ保存
-    if collected_data:
+    if len(collected_data):
         logger.info("\n💾 データを保存中...")
+        df = collector._to_sorted_df(collected_data)
         
         # JSON保存
         collector.save_to_json(collected_data, f'{output_prefix}.json')
         
+        # Parquet保存
+        collector.save_to_parquet(collected_data, f'{output_prefix}.parquet')
+        
         # CSV保存
-        collector.save_to_csv(collected_data, f'{output_prefix}.csv')
+        collector.save_to_csv(collected_data, f'{output_prefix}.csv', df=df)
         
         # Excel保存（オプション）
         save_excel = input("\nExcelファイルも保存しますか？ (y/n): ")
         if save_excel.lower() == 'y':
-            collector.save_to_excel(collected_data, f'{output_prefix}.xlsx')
+            collector.save_to_excel(collected_data, f'{output_prefix}.xlsx', df=df)
         
         # サンプルデータ表示
         print("\n📊 取得データのサンプル（プレイヤー数TOP 5）:")
         print("="*70)
-        sorted_data = sorted(collected_data, key=lambda x: x.get('player_count', 0), reverse=True)
-        for game in sorted_data[:5]:
-            print(json.dumps(game, ensure_ascii=False, indent=2))
+        for game in df.head(5).to_dict('records'):
+            print(orjson.dumps(game, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode())
             print("-"*70)
         
         logger.info(f"\n✨ 完了！ {len(collected_data):,}件のプレイヤー数データを保存しました")